@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+# File: taj_core/benchmarks/qualification_hooks.py
+"""
+Benchmark for the purchase-submit qualification hooks.
+
+    bench --site <site> execute taj_core.benchmarks.qualification_hooks.run \\
+        --kwargs "{'scales': [10, 100, 1000], 'output': '/tmp/taj_bench.json'}"
+
+For each scale it seeds synthetic suppliers under a two-level Supplier Group
+hierarchy, Partially Approved qualifications and approved items, then times and
+counts queries for the hooks with 1, 50 and 500-line documents (cold and warm
+cache). Everything is rolled back; the JSON report is printed and optionally written.
+"""
+from __future__ import annotations
+
+import frappe
+
+from taj_core.benchmarks.utils import measure, rolled_back, write_report
+
+BENCH_PREFIX = "TAJ-BENCH-"
+LINE_COUNTS = (1, 50, 500)
+BACKGROUND_ITEMS = 50
+
+
+def run(scales=(10, 100, 1000), lines=LINE_COUNTS, repeat: int = 5, output: str | None = None) -> dict:
+    from taj_core.integrations.supplier_hooks import _clear_qualified_groups_cache
+    from taj_core.qc.doctype.supplier_qualification.supplier_qualification import (
+        SNAPSHOT_CACHE_KEY,
+        auto_set_item_status_for_po,
+        get_supplier_items_status_map,
+        request_items_approval,
+        validate_items_against_qualification,
+    )
+
+    scales = [int(s) for s in frappe.parse_json(scales)] if isinstance(scales, str) else [int(s) for s in scales]
+    lines = [int(n) for n in frappe.parse_json(lines)] if isinstance(lines, str) else [int(n) for n in lines]
+    report = {"benchmark": "qualification_hooks", "repeat": int(repeat), "results": []}
+
+    for scale in scales:
+        with rolled_back():
+            seeded = _seed(scale, max(lines))
+            _clear_qualified_groups_cache()
+            supplier = seeded["suppliers"][0]
+            approved = seeded["items"]
+
+            for count in lines:
+                codes = approved[:count]
+                po = _purchase_order(supplier, codes)
+                pending = [f"{BENCH_PREFIX}NEW-{i:05d}" for i in range(count)]
+
+                def cold(fn):
+                    def wrapped():
+                        frappe.cache().hdel(SNAPSHOT_CACHE_KEY, supplier)
+                        frappe.local.cache = {}
+                        fn()
+                    return wrapped
+
+                cases = {
+                    "validate_items_against_qualification": lambda: validate_items_against_qualification(po),
+                    "auto_set_item_status_for_po": lambda: (po.set("taj_item_status_digest", None), auto_set_item_status_for_po(po)),
+                    "get_supplier_items_status_map": lambda: get_supplier_items_status_map(supplier, codes),
+                }
+                for name, fn in cases.items():
+                    report["results"].append({
+                        "scale": scale, "lines": count, "hook": name,
+                        "cold": measure(cold(fn), repeat), "warm": measure(fn, repeat),
+                    })
+
+                # request_items_approval يضيف صفوفاً، لذا تُقاس مرة واحدة لكل حجم
+                report["results"].append({
+                    "scale": scale, "lines": count, "hook": "request_items_approval",
+                    "cold": measure(lambda: request_items_approval(supplier, pending), 1),
+                })
+
+            for supplier_name in seeded["suppliers"]:
+                frappe.cache().hdel(SNAPSHOT_CACHE_KEY, supplier_name)
+        _clear_qualified_groups_cache()
+
+    return write_report(report, output)
+
+
+def _purchase_order(supplier: str, codes: list[str]):
+    return frappe.get_doc({
+        "doctype": "Purchase Order",
+        "name": f"{BENCH_PREFIX}PO",
+        "supplier": supplier,
+        "items": [{"item_code": code} for code in codes],
+    })
+
+
+def _seed(scale: int, item_count: int) -> dict:
+    """Seed groups, items, suppliers, qualifications and approved items with bulk inserts."""
+    now, user = frappe.utils.now(), frappe.session.user
+    meta = ["creation", "modified", "owner", "modified_by", "docstatus", "idx"]
+    meta_values = (now, now, user, user, 0, 0)
+
+    # مجموعة أب مؤهلة + مجموعة فرعية (NestedSet يحتاج insert عادي لـ lft/rgt)
+    parent_group = f"{BENCH_PREFIX}GROUP"
+    child_group = f"{BENCH_PREFIX}GROUP-CHILD"
+    if not frappe.db.exists("Supplier Group", parent_group):
+        frappe.get_doc({"doctype": "Supplier Group", "supplier_group_name": parent_group, "is_group": 1}).insert(
+            ignore_permissions=True
+        )
+    if not frappe.db.exists("Supplier Group", child_group):
+        frappe.get_doc({
+            "doctype": "Supplier Group", "supplier_group_name": child_group, "parent_supplier_group": parent_group,
+        }).insert(ignore_permissions=True)
+
+    settings = frappe.get_single("Supplier Qualification Settings")
+    if parent_group not in [row.supplier_group for row in settings.get("supplier_group", [])]:
+        settings.append("supplier_group", {"supplier_group": parent_group})
+        settings.save(ignore_permissions=True)
+
+    item_group = frappe.db.get_value("Item Group", {"is_group": 0}, "name")
+    items = [f"{BENCH_PREFIX}ITEM-{i:05d}" for i in range(item_count)]
+    new_items = [f"{BENCH_PREFIX}NEW-{i:05d}" for i in range(item_count)]
+    frappe.db.bulk_insert(
+        "Item",
+        fields=["name", *meta, "item_code", "item_name", "item_group", "stock_uom"],
+        values=[(code, *meta_values, code, code, item_group, "Nos") for code in items + new_items],
+        ignore_duplicates=True,
+    )
+
+    suppliers = [f"{BENCH_PREFIX}SUP-{i:06d}" for i in range(scale)]
+    frappe.db.bulk_insert(
+        "Supplier",
+        fields=["name", *meta, "supplier_name", "supplier_group", "supplier_type"],
+        values=[(s, *meta_values, s, child_group, "Company") for s in suppliers],
+        ignore_duplicates=True,
+    )
+    frappe.db.bulk_insert(
+        "Supplier Qualification",
+        fields=["name", *meta, "supplier", "supplier_name", "approval_status", "valid_from"],
+        values=[(s, *meta_values, s, s, "Partially Approved", frappe.utils.nowdate()) for s in suppliers],
+        ignore_duplicates=True,
+    )
+    frappe.db.bulk_insert(
+        "Supplier Approved Item",
+        fields=["name", *meta[:-1], "idx", "parent", "parenttype", "parentfield", "item", "item_name", "item_status"],
+        values=[
+            (frappe.generate_hash(length=10), *meta_values[:-1], idx, s, "Supplier Qualification", "sq_items",
+             code, code, "Approved")
+            for s in suppliers
+            # المورد المقاس يحصل على كل الأصناف، والباقي يضخّم حجم الجداول فقط
+            for idx, code in enumerate(items if s == suppliers[0] else items[:BACKGROUND_ITEMS], start=1)
+        ],
+    )
+    return {"suppliers": suppliers, "items": items}
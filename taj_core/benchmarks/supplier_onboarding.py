@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+# File: taj_core/benchmarks/supplier_onboarding.py
+"""
+Throughput benchmark for bulk supplier onboarding.
+
+    bench --site <site> execute taj_core.benchmarks.supplier_onboarding.run --kwargs "{'count': 10000}"
+
+Seeds synthetic suppliers in a qualified group, onboards them through
+`onboard_pending_suppliers`, prints a JSON report and rolls everything back.
+"""
+from __future__ import annotations
+import time
+
+import frappe
+
+from taj_core.benchmarks.utils import rolled_back, write_report
+
+BENCH_PREFIX = "TAJ-BENCH-SUP-"
+
+
+def run(count: int = 10000, group: str | None = None) -> dict:
+    from taj_core.integrations.supplier_hooks import (
+        get_qualified_group_closure,
+        onboard_pending_suppliers,
+    )
+
+    count = int(count)
+    group = group or next(iter(sorted(get_qualified_group_closure())), None)
+    if not group:
+        frappe.throw("No qualified supplier group configured in Supplier Qualification Settings")
+
+    # onboard_pending_suppliers يعمل commit، لذا نمنعه مؤقتاً حتى يمكن التراجع
+    with rolled_back():
+        suppliers = _seed_suppliers(count, group)
+        started = time.perf_counter()
+        result = onboard_pending_suppliers(suppliers)
+        elapsed = time.perf_counter() - started
+
+    report = {
+        "benchmark": "bulk_supplier_onboarding",
+        "suppliers": count,
+        "created": result.get("created"),
+        "todos": result.get("todos"),
+        "seconds": round(elapsed, 3),
+        "suppliers_per_second": round(count / elapsed, 1) if elapsed else None,
+    }
+    return write_report(report)
+
+
+def _seed_suppliers(count: int, group: str) -> list[str]:
+    now = frappe.utils.now()
+    user = frappe.session.user
+    names = [f"{BENCH_PREFIX}{i:06d}" for i in range(count)]
+    frappe.db.bulk_insert(
+        "Supplier",
+        fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+                "supplier_name", "supplier_group", "supplier_type"],
+        values=[(n, now, now, user, user, 0, 0, n, group, "Company") for n in names],
+        ignore_duplicates=True,
+    )
+    return names
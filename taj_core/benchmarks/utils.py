@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# File: taj_core/benchmarks/utils.py
+"""Shared helpers for taj_core benchmarks (run through `bench execute`, never in production)."""
+from __future__ import annotations
+import json
+import time
+from contextlib import contextmanager
+
+import frappe
+
+
+@contextmanager
+def rolled_back():
+    """Disable commits while the block runs, then roll everything back."""
+    commit = frappe.db.commit
+    frappe.db.commit = lambda *args, **kwargs: None
+    try:
+        yield
+    finally:
+        frappe.db.commit = commit
+        frappe.db.rollback()
+
+
+@contextmanager
+def count_queries():
+    """Count frappe.db.sql calls inside the block: `with count_queries() as counter: ...; counter["queries"]`."""
+    counter = {"queries": 0}
+    sql = frappe.db.sql
+
+    def counting_sql(*args, **kwargs):
+        counter["queries"] += 1
+        return sql(*args, **kwargs)
+
+    frappe.db.sql = counting_sql
+    try:
+        yield counter
+    finally:
+        frappe.db.sql = sql
+
+
+def measure(fn, repeat: int = 5) -> dict:
+    """Run `fn` `repeat` times; return mean/min milliseconds and queries per call."""
+    timings, queries = [], []
+    for _ in range(repeat):
+        with count_queries() as counter:
+            started = time.perf_counter()
+            fn()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(counter["queries"])
+    return {
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "queries": round(sum(queries) / len(queries), 1),
+    }
+
+
+def write_report(report: dict, output: str | None = None) -> dict:
+    text = json.dumps(report, indent=2, default=str)
+    if output:
+        with open(output, "w") as f:
+            f.write(text)
+    print(text)
+    return report
@@ -4,6 +4,8 @@ from frappe.model.document import Document
 from frappe.utils import getdate, today, date_diff
 from frappe import _
 
+from taj_core.utils.role_directory import get_role_emails
+
 def get_license_status(days_difference, renew_days=0):
     """
     Calculate license status based on days difference and renew days
@@ -213,23 +215,8 @@ def send_license_notification(row_or_doc, new_status: str = None):
         if not allowed_role:
             return
 
-        # المستخدمون الذين لديهم الدور
-        has_roles = frappe.get_all(
-            "Has Role",
-            filters={"role": allowed_role, "parenttype": "User"},
-            fields=["parent as user"],
-            distinct=True,
-        )
-        if not has_roles:
-            return
-
-        users = [hr["user"] for hr in has_roles]
-        user_docs = frappe.get_all(
-            "User",
-            filters={"name": ["in", users], "enabled": 1},
-            fields=["email"],
-        )
-        emails = [u["email"] for u in user_docs if u.get("email")]
+        # المستخدمون المفعّلون الذين لديهم الدور (دليل مشترك من الكاش)
+        emails = get_role_emails(allowed_role)
         if not emails:
             return
 
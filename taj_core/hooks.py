@@ -12,11 +12,17 @@ doctype_js = {
     "BOM": "public/js/bom.js",
 }
 
+doctype_list_js = {
+    "Purchase Order": "public/js/purchase_bulk_submit_list.js",
+    "Purchase Receipt": "public/js/purchase_bulk_submit_list.js",
+}
+
 
 scheduler_events = {
 	"daily": [
 		"taj_core.company_documents.doctype.license.license.scheduled_status_update",
-        "taj_core.qc.doctype.supplier_qualification.supplier_qualification.update_certificate_statuses"
+        "taj_core.qc.doctype.supplier_qualification.supplier_qualification.update_certificate_statuses",
+        "taj_core.integrations.supplier_hooks.sweep_new_suppliers",
 	],
     "monthly": [
         "taj_core.public.production_plan.generate_stickers.delete_old_production_stickers"
@@ -43,6 +49,8 @@ doc_events = {
         "before_insert": "taj_core.integrations.supplier_hooks.ensure_supplier_group_required",
         "validate": "taj_core.integrations.supplier_hooks.validate_supplier_group",
         "after_insert": "taj_core.integrations.supplier_hooks.create_qualification_for_new_supplier",
+        "on_update": "taj_core.qc.doctype.supplier_qualification.supplier_qualification.clear_qualification_snapshot",
+        "on_trash": "taj_core.qc.doctype.supplier_qualification.supplier_qualification.clear_qualification_snapshot",
     },
 
     "Supplier Qualification Settings": {
@@ -51,14 +59,33 @@ doc_events = {
         "on_trash": "taj_core.integrations.supplier_hooks._clear_qualified_groups_cache",
     },
 
+    "Supplier Group": {
+        "on_update": "taj_core.integrations.supplier_hooks._clear_qualified_groups_cache",
+        "after_rename": "taj_core.integrations.supplier_hooks._clear_qualified_groups_cache",
+        "on_trash": "taj_core.integrations.supplier_hooks._clear_qualified_groups_cache",
+    },
+
     "Supplier Qualification": {
         "before_save": [
             "taj_core.qc.doctype.supplier_qualification.supplier_qualification.before_save_capture_status",
-            "taj_core.qc.doctype.supplier_qualification.supplier_qualification.dedupe_approved_items"
+            "taj_core.qc.doctype.supplier_qualification.supplier_qualification.dedupe_approved_items",
+            "taj_core.qc.doctype.supplier_qualification.supplier_qualification.set_certificate_statuses"
         ],
         "validate": [
             "taj_core.qc.doctype.supplier_qualification.supplier_qualification.validate_approval_status"
         ],
+        "on_update": [
+            "taj_core.qc.doctype.supplier_qualification.supplier_qualification.clear_qualification_snapshot",
+            "taj_core.qc.doctype.supplier_qualification.supplier_qualification.enqueue_po_item_status_refresh",
+            "taj_core.qc.doctype.supplier_qualification_scorecard.supplier_qualification_scorecard.on_qualification_change",
+            "taj_core.qc.doctype.supplier_qualification_history.supplier_qualification_history.on_qualification_change",
+        ],
+        "after_insert": "taj_core.qc.doctype.supplier_qualification.supplier_qualification.clear_qualification_snapshot",
+        "on_trash": [
+            "taj_core.qc.doctype.supplier_qualification.supplier_qualification.clear_qualification_snapshot",
+            "taj_core.qc.doctype.supplier_qualification_scorecard.supplier_qualification_scorecard.on_qualification_change",
+            "taj_core.qc.doctype.supplier_qualification_history.supplier_qualification_history.on_qualification_change",
+        ],
     },
 
     "Purchase Order": {
@@ -91,12 +118,51 @@ doc_events = {
     "Supplier Quotation": {
         "before_submit": "taj_core.qc.doctype.supplier_qualification.supplier_qualification.validate_items_against_qualification",
     },
+    "Employee": {
+        "on_update": "taj_core.peopleops.checkin_engine.on_reference_change",
+        "on_trash": "taj_core.peopleops.checkin_engine.on_reference_change",
+    },
+    "Holiday List": {
+        "on_update": "taj_core.peopleops.checkin_engine.on_reference_change",
+        "on_trash": "taj_core.peopleops.checkin_engine.on_reference_change",
+    },
+    "Shift Type": {
+        "on_update": "taj_core.peopleops.checkin_engine.on_reference_change",
+        "on_trash": "taj_core.peopleops.checkin_engine.on_reference_change",
+    },
+    "Shift Assignment": {
+        "on_submit": "taj_core.peopleops.checkin_engine.on_reference_change",
+        "on_cancel": "taj_core.peopleops.checkin_engine.on_reference_change",
+        "on_update_after_submit": "taj_core.peopleops.checkin_engine.on_reference_change",
+    },
+    "Employee Checkin": {
+        "after_insert": [
+            "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary.on_checkin_change",
+            "taj_core.peopleops.checkin_engine.extend_checkin_year_range",
+        ],
+        "on_update": "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary.on_checkin_change",
+        "after_delete": "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary.on_checkin_change",
+    },
+    "Attendance": {
+        "on_submit": "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary.on_attendance_change",
+        "on_cancel": "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary.on_attendance_change",
+    },
+    "Leave Application": {
+        "on_submit": "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary.on_leave_change",
+        "on_cancel": "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary.on_leave_change",
+    },
+    "User": {
+        "on_update": "taj_core.utils.role_directory.clear_role_directory",
+        "on_trash": "taj_core.utils.role_directory.clear_role_directory",
+    },
     "Item":{
         'before_insert': "taj_core.custom.item.update_item_batch_no",
         'before_save': "taj_core.qc.doctype.raw_material_specification.override.item.raw_material_specification"
     },
 }
 
+# سجل التاريخ يبقى بعد حذف التأهيل
+ignore_links_on_delete = ["Supplier Qualification History"]
 
 
 after_install = "taj_core.install.after_install"
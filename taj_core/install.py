@@ -90,6 +90,9 @@ def after_migrate():
         # frappe.db.commit()
         # click.secho("✅ Workspaces verified/created successfully", fg="green")
 
+    except setup_module.MissingIndexError:
+        # فهرس مفقود يجب أن يُفشل bench migrate بدل ابتلاعه
+        raise
     except Exception as e:
         handle_migration_error(e)
 
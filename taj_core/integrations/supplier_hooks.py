@@ -1,73 +1,95 @@
 # -*- coding: utf-8 -*-
 # File: taj_core/integrations/supplier_hooks.py
 from __future__ import annotations
+import json
 import frappe
 from frappe import _
 from functools import lru_cache
-import time
 from typing import Optional
 
-@lru_cache(maxsize=256)
+QUALIFIED_GROUPS_CACHE_KEY = "taj_qualified_supplier_groups"
+QUALIFIED_GROUPS_GENERATION_KEY = "taj_qualified_supplier_groups_generation"
+ONBOARDING_WATERMARK_KEY = "taj_supplier_onboarding_watermark"
+
+
 def is_qualified_supplier_group(group: str | None) -> bool:
-    """نسخة محسنة مع Cache للعلاقات الهرمية"""
+    """True if the group, or any of its ancestors, is listed in Supplier Qualification Settings."""
     if not group:
         return False
-    
+    return _is_qualified_supplier_group(group, _get_qualified_groups_generation())
+
+@lru_cache(maxsize=256)
+def _is_qualified_supplier_group(group: str, generation: int) -> bool:
+    """
+    Process-local cache. The generation is part of the key, so a bump from any
+    worker makes every other worker miss and re-read the shared closure.
+    """
     try:
-        settings = frappe.get_cached_doc("Supplier Qualification Settings")
-        qualified_groups = [row.supplier_group for row in settings.get("supplier_group", [])]
-        
-        # التحقق المباشر أولاً
-        if group in qualified_groups:
-            return True
-            
-        # التحقق من الـ Hierarchy
-        return check_group_hierarchy(group, qualified_groups)
-        
+        return group in get_qualified_group_closure()
     except Exception:
         return False
 
-def check_group_hierarchy(group: str, qualified_groups: list) -> bool:
-    """التحقق من التسلسل الهرمي للمجموعة"""
-    # Cache للعلاقات الهرمية
-    cache_key = f"group_hierarchy_{group}"
-    cached_result = frappe.cache().get_value(cache_key)
-    
-    if cached_result is not None:
-        return cached_result
-    
-    result = _check_group_hierarchy_recursive(group, qualified_groups, set())
-    
-    # حفظ النتيجة في Cache لمدة ساعة
-    frappe.cache().set_value(cache_key, result, expires_in_sec=3600)
-    return result
+def _get_qualified_groups_generation() -> int:
+    """قراءة رقم الجيل من Redis مرة واحدة لكل طلب/مهمة"""
+    generation = getattr(frappe.local, "taj_qualified_groups_generation", None)
+    if generation is None:
+        try:
+            cache = frappe.cache()
+            generation = int(cache.get(cache.make_key(QUALIFIED_GROUPS_GENERATION_KEY)) or 0)
+        except Exception:
+            generation = -1  # Redis غير متاح: لا نعتمد على الـ cache المحلي القديم
+            _is_qualified_supplier_group.cache_clear()
+        frappe.local.taj_qualified_groups_generation = generation
+    return generation
 
-def _check_group_hierarchy_recursive(group: str, qualified_groups: list, visited: set) -> bool:
-    """دالة متكررة للتحقق من الـ Hierarchy"""
-    if group in visited:
-        return False
-    visited.add(group)
-    
-    # إذا كانت المجموعة مؤهلة مباشرة
-    if group in qualified_groups:
-        return True
-    
-    # الحصول على Parent Group
-    parent = frappe.db.get_value("Supplier Group", group, "parent_supplier_group")
-    if not parent:
-        return False
-    
-    # التحقق من Parent بشكل متكرر
-    return _check_group_hierarchy_recursive(parent, qualified_groups, visited)
+def _bump_qualified_groups_generation() -> None:
+    """
+    زيادة رقم الجيل لإبطال الـ LRU Cache في كل العمليات (web + workers) - بعد الـ commit فقط،
+    حتى لا تُخزَّن إجابات مبنية على بيانات ما قبل الـ commit تحت الجيل الجديد
+    """
+    def bump():
+        cache = frappe.cache()
+        frappe.local.taj_qualified_groups_generation = cache.incr(cache.make_key(QUALIFIED_GROUPS_GENERATION_KEY))
+        _is_qualified_supplier_group.cache_clear()
+
+    frappe.db.after_commit.add(bump)
+
+def get_qualified_group_closure() -> frozenset:
+    """كل المجموعات المؤهلة مباشرة أو عبر مجموعة أب (من Redis، ويُبنى عند الحاجة)"""
+    return frappe.cache().get_value(QUALIFIED_GROUPS_CACHE_KEY, generator=_build_qualified_group_closure)
+
+def _build_qualified_group_closure() -> frozenset:
+    """بناء الـ closure من أعمدة lft/rgt للـ Nested Set باستعلام واحد"""
+    qualified_groups = get_qualified_supplier_groups()
+    if not qualified_groups:
+        return frozenset()
+
+    rows = frappe.db.sql(
+        """
+        SELECT DISTINCT child.name
+        FROM `tabSupplier Group` child
+        INNER JOIN `tabSupplier Group` anc
+            ON child.lft >= anc.lft AND child.rgt <= anc.rgt
+        WHERE anc.name IN %(groups)s
+        """,
+        {"groups": tuple(qualified_groups)},
+    )
+    # المجموعات المحددة في الإعدادات مؤهلة حتى لو كانت قيم lft/rgt غير مبنية بعد
+    return frozenset(qualified_groups).union(r[0] for r in rows)
 
 def _clear_qualified_groups_cache(doc=None, method=None):
-    """مسح جميع أنواع الـ Cache المتعلقة بالمجموعات"""
+    """مسح الـ closure والـ LRU Cache (Settings / Supplier Group)؛ يُعاد البناء عند أول قراءة بعد الـ commit"""
     try:
-        # مسح LRU Cache
-        is_qualified_supplier_group.cache_clear()
-        
-        # مسح Frappe Cache للعلاقات الهرمية
-        frappe.cache().delete_keys("group_hierarchy_*")
+        def clear():
+            frappe.cache().delete_value(QUALIFIED_GROUPS_CACHE_KEY)
+
+        clear()
+        # قارئ متزامن قد يبني الـ closure من بيانات ما قبل الـ commit
+        frappe.db.after_commit.add(clear)
+
+        # مسح LRU Cache محلياً وفي باقي العمليات عبر رقم الجيل
+        _is_qualified_supplier_group.cache_clear()
+        _bump_qualified_groups_generation()
         
     except Exception as e:
         frappe.log_error(f"Error clearing groups cache: {str(e)}")
@@ -83,27 +105,63 @@ def validate_supplier_group(doc, method=None):
         frappe.throw(_("Supplier Group {0} does not exist.").format(doc.supplier_group))
 
 def create_qualification_for_new_supplier(doc, method=None):
-    """إنشاء تلقائي لـ Supplier Qualification للمجموعات المؤهلة"""
+    """جدولة إنشاء Supplier Qualification للمجموعات المؤهلة بعد الـ commit (بدون انتظار)"""
     try:
-        # تأخير بسيط لضمان حفظ المستند
-        time.sleep(0.3)
-        frappe.db.commit()
-
-        # التحقق إذا كانت المجموعة تتطلب تأهيل
+        # التحقق إذا كانت المجموعة تتطلب تأهيل (O(1) من الـ closure)
         if not is_qualified_supplier_group(doc.supplier_group):
             frappe.logger().debug(f"Supplier group {doc.supplier_group} does not require qualification")
             return
 
-        # التحقق إذا كان المؤهل موجود مسبقاً
-        if frappe.db.exists("Supplier Qualification", {"supplier": doc.name}):
-            frappe.logger().debug(f"Qualification already exists for supplier {doc.name}")
+        # أثناء الاستيراد: مهمة دفعية واحدة بدلاً من مهمة لكل مورد.
+        # الموردون الذين يُحفظون بعد استعلام المهمة الجارية يلتقطهم الـ sweep اليومي
+        if frappe.flags.in_import:
+            frappe.enqueue(
+                "taj_core.integrations.supplier_hooks.sweep_new_suppliers",
+                queue="long",
+                job_id="taj_bulk_supplier_onboarding",
+                deduplicate=True,
+                enqueue_after_commit=True,
+            )
             return
 
+        frappe.enqueue(
+            "taj_core.integrations.supplier_hooks.create_supplier_qualification",
+            queue="short",
+            job_id=f"taj_create_supplier_qualification::{doc.name}",
+            deduplicate=True,
+            enqueue_after_commit=True,
+            supplier=doc.name,
+        )
+
+    except Exception:
+        frappe.log_error(
+            title=f"Error queuing qualification for {doc.name}",
+            message=frappe.get_traceback()
+        )
+
+def create_supplier_qualification(supplier: str) -> str | None:
+    """
+    Background job: create the initial Supplier Qualification for a supplier.
+    Idempotent - returns the existing qualification if one is already there.
+    """
+    try:
+        supplier_group, supplier_name = frappe.db.get_value(
+            "Supplier", supplier, ["supplier_group", "supplier_name"]
+        ) or (None, None)
+        if not supplier_group or not is_qualified_supplier_group(supplier_group):
+            return None
+
+        # التحقق إذا كان المؤهل موجود مسبقاً
+        existing = frappe.db.get_value("Supplier Qualification", {"supplier": supplier}, "name")
+        if existing:
+            frappe.logger().debug(f"Qualification already exists for supplier {supplier}")
+            return existing
+
         # إنشاء Supplier Qualification جديد
         qualification = frappe.get_doc({
             "doctype": "Supplier Qualification",
-            "supplier": doc.name,
-            "supplier_name": doc.supplier_name,
+            "supplier": supplier,
+            "supplier_name": supplier_name,
             "approval_status": "Request Approval",
             "valid_from": frappe.utils.nowdate()
         })
@@ -112,15 +170,176 @@ def create_qualification_for_new_supplier(doc, method=None):
         qualification.flags.ignore_mandatory = True
         qualification.insert()
         
-        frappe.db.commit()
-        
-        frappe.logger().debug(f"Auto-created qualification for supplier {doc.name}")
+        frappe.logger().debug(f"Auto-created qualification for supplier {supplier}")
+        return qualification.name
         
-    except Exception as e:
+    except frappe.DuplicateEntryError:
+        # أنشأتها عملية أخرى في نفس اللحظة
+        return frappe.db.get_value("Supplier Qualification", {"supplier": supplier}, "name")
+    except Exception:
         frappe.log_error(
-            title=f"Error creating qualification for {doc.name}",
+            title=f"Error creating qualification for {supplier}",
             message=frappe.get_traceback()
         )
+        return None
+
+# ----------------------------
+# Bulk onboarding
+# ----------------------------
+
+@frappe.whitelist()
+def bulk_onboard_suppliers(suppliers: list[str] | str | None = None) -> dict:
+    """
+    Create missing qualifications (and approval ToDos) for many suppliers at once.
+    Without `suppliers`, every supplier in a qualified group that has no qualification is onboarded.
+    """
+    frappe.has_permission("Supplier Qualification", "create", throw=True)
+    if isinstance(suppliers, str):
+        suppliers = frappe.parse_json(suppliers)
+    return onboard_pending_suppliers(suppliers)
+
+def sweep_new_suppliers() -> dict:
+    """
+    Batch job (data import / daily): onboard suppliers created since the last successful
+    sweep. The watermark starts at deploy time, so legacy suppliers are never swept in;
+    use bulk_onboard_suppliers for those explicitly.
+    """
+    started = frappe.utils.now()
+    watermark = frappe.db.get_global(ONBOARDING_WATERMARK_KEY)
+    if not watermark:
+        frappe.db.set_global(ONBOARDING_WATERMARK_KEY, started)
+        frappe.db.commit()
+        return {"created": 0, "todos": 0}
+
+    result = onboard_pending_suppliers(created_since=watermark)
+    # التداخل مع التشغيل السابق آمن: الموردون المؤهلون مسبقاً لا يُعاد إنشاؤهم
+    frappe.db.set_global(ONBOARDING_WATERMARK_KEY, started)
+    frappe.db.commit()
+    return result
+
+def onboard_pending_suppliers(suppliers: list[str] | None = None, created_since: str | None = None) -> dict:
+    """
+    One query to find the suppliers that need a qualification, multi-row inserts for
+    Supplier Qualification and ToDo, one commit. ToDos, assignments and history are
+    written only for the qualifications this run actually inserted.
+    """
+    closure = get_qualified_group_closure()
+    if not closure or (suppliers is not None and not suppliers):
+        return {"created": 0, "todos": 0}
+
+    conditions = ["q.name IS NULL", "s.supplier_group IN %(groups)s"]
+    params = {"groups": tuple(closure)}
+    if suppliers:
+        conditions.append("s.name IN %(suppliers)s")
+        params["suppliers"] = tuple(suppliers)
+    if created_since:
+        conditions.append("s.creation >= %(created_since)s")
+        params["created_since"] = created_since
+
+    pending = frappe.db.sql(
+        f"""
+        SELECT s.name, s.supplier_name
+        FROM `tabSupplier` s
+        LEFT JOIN `tabSupplier Qualification` q ON q.supplier = s.name
+        WHERE {" AND ".join(conditions)}
+        """,
+        params,
+        as_dict=True,
+    )
+    if not pending:
+        return {"created": 0, "todos": 0}
+
+    from taj_core.qc.doctype.supplier_qualification.supplier_qualification import SNAPSHOT_CACHE_KEY
+    from taj_core.qc.doctype.supplier_qualification_history.supplier_qualification_history import (
+        record_transitions,
+    )
+    from taj_core.qc.doctype.supplier_qualification_scorecard.supplier_qualification_scorecard import (
+        refresh_scorecards,
+    )
+    from taj_core.utils.role_directory import get_next_assignees
+
+    now = frappe.utils.now()
+    today = frappe.utils.nowdate()
+    user = frappe.session.user
+    settings = frappe.get_cached_doc("Supplier Qualification Settings")
+    assigned_role = getattr(settings, "default_todo_role", "Quality Manager")
+    assignees = get_next_assignees(assigned_role, len(pending))
+
+    # Supplier Qualification تُسمى بـ field:supplier
+    frappe.db.bulk_insert(
+        "Supplier Qualification",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+            "supplier", "supplier_name", "approval_status", "valid_from",
+        ],
+        values=[
+            (row.name, now, now, user, user, 0, 0,
+             row.name, row.supplier_name, "Request Approval", today)
+            for row in pending
+        ],
+        ignore_duplicates=True,
+    )
+
+    # مؤهلية أنشأتها create_supplier_qualification بالتوازي تُتجاهل: لها ToDo وسجل خاص بها
+    created = set(frappe.get_all(
+        "Supplier Qualification",
+        filters={"name": ["in", [row.name for row in pending]], "creation": now, "owner": user},
+        pluck="name",
+    ))
+    pending = [row for row in pending if row.name in created]
+    if not pending:
+        frappe.db.commit()
+        return {"created": 0, "todos": 0}
+    assignees = assignees[: len(pending)]
+
+    todo_values = []
+    assign_cases, assign_params = [], []
+    for i, row in enumerate(pending):
+        allocated_to = assignees[i] if assignees else user
+        assign_cases.append("WHEN %s THEN %s")
+        assign_params.extend([row.name, json.dumps([allocated_to])])
+        description = _("🆕 New supplier requires qualification: {0} ({1})").format(
+            row.supplier_name, row.name
+        )
+        todo_values.append((
+            frappe.generate_hash(length=10), now, now, user, user, 0, 0,
+            "Open", "High", today, allocated_to,
+            description, "Supplier Qualification", row.name, assigned_role, user,
+        ))
+    frappe.db.bulk_insert(
+        "ToDo",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus", "idx",
+            "status", "priority", "date", "allocated_to",
+            "description", "reference_type", "reference_name", "role", "assigned_by",
+        ],
+        values=todo_values,
+    )
+    # الإدخال المباشر يتخطى ToDo.on_update، لذلك نكتب _assign (Assigned To) بتحديث واحد
+    frappe.db.sql(
+        f"""
+        UPDATE `tabSupplier Qualification`
+        SET `_assign` = CASE name {" ".join(assign_cases)} END
+        WHERE name IN %s
+        """,
+        [*assign_params, tuple(row.name for row in pending)],
+    )
+
+    record_transitions([
+        {"supplier": row.name, "status": "Request Approval", "qualification": row.name,
+         "valid_from": today, "effective_from": now}
+        for row in pending
+    ])
+    refresh_scorecards([row.name for row in pending])
+    frappe.db.commit()
+
+    # الإدخال المباشر لا يمر بالـ doc_events، لذلك نمسح الـ snapshot يدوياً
+    cache = frappe.cache()
+    for row in pending:
+        cache.hdel(SNAPSHOT_CACHE_KEY, row.name)
+
+    frappe.logger().info(f"Bulk onboarded {len(pending)} suppliers")
+    return {"created": len(pending), "todos": len(todo_values)}
 
 def is_supplier_approved(supplier: str) -> bool:
     """Check if supplier has approved qualification"""
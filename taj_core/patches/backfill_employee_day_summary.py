@@ -0,0 +1,17 @@
+import frappe
+
+
+def execute():
+    """Fill Employee Day Summary from existing punches in the background; the report reads raw punches until it finishes."""
+    frappe.reload_doc("peopleops", "doctype", "employee_day_summary")
+    if not frappe.db.table_exists("Employee Checkin"):
+        return
+
+    frappe.enqueue(
+        "taj_core.peopleops.doctype.employee_day_summary.employee_day_summary._rebuild_day_summaries",
+        queue="long",
+        timeout=4 * 3600,
+        job_id="taj_rebuild_day_summaries::None::None",
+        deduplicate=True,
+        enqueue_after_commit=True,
+    )
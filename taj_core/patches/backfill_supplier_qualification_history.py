@@ -0,0 +1,48 @@
+import frappe
+
+
+def execute():
+    """Baseline history: current state of every qualification, effective from its last modification."""
+    frappe.reload_doc("qc", "doctype", "supplier_qualification_history")
+    if frappe.db.count("Supplier Qualification History"):
+        return
+
+    from taj_core.qc.doctype.supplier_qualification_history.supplier_qualification_history import (
+        QUALIFICATION_LEVEL,
+        record_transitions,
+    )
+
+    entries = [
+        {
+            "supplier": q.supplier,
+            "item": QUALIFICATION_LEVEL,
+            "effective_from": q.modified,
+            "status": q.approval_status,
+            "qualification": q.name,
+            "valid_from": q.valid_from,
+            "valid_to": q.valid_to,
+        }
+        for q in frappe.get_all(
+            "Supplier Qualification",
+            fields=["name", "supplier", "approval_status", "valid_from", "valid_to", "modified"],
+        )
+    ]
+    entries += [
+        {
+            "supplier": row.supplier,
+            "item": row.item,
+            "effective_from": row.modified,
+            "status": row.item_status,
+            "qualification": row.parent,
+        }
+        for row in frappe.db.sql(
+            """
+            SELECT i.parent, i.item, i.item_status, i.modified, q.supplier
+            FROM `tabSupplier Approved Item` i
+            INNER JOIN `tabSupplier Qualification` q ON q.name = i.parent
+            WHERE i.parenttype = 'Supplier Qualification' AND IFNULL(i.item, '') != ''
+            """,
+            as_dict=True,
+        )
+    ]
+    record_transitions(entries)
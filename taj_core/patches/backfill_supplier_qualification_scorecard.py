@@ -0,0 +1,10 @@
+import frappe
+
+
+def execute():
+    frappe.reload_doc("qc", "doctype", "supplier_qualification_scorecard")
+
+    from taj_core.qc.doctype.supplier_qualification_scorecard.supplier_qualification_scorecard import (
+        _rebuild_all_scorecards,
+    )
+    _rebuild_all_scorecards()
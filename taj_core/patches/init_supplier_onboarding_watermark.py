@@ -0,0 +1,9 @@
+import frappe
+
+
+def execute():
+    """Start the supplier onboarding sweep from deploy time so legacy suppliers are not swept in."""
+    from taj_core.integrations.supplier_hooks import ONBOARDING_WATERMARK_KEY
+
+    if not frappe.db.get_global(ONBOARDING_WATERMARK_KEY):
+        frappe.db.set_global(ONBOARDING_WATERMARK_KEY, frappe.utils.now())
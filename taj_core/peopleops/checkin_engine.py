@@ -0,0 +1,487 @@
+# ------------ Checkin Engine: one compact record per (employee, day) — shared by reports & APIs
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+import frappe
+from frappe.query_builder import Case
+from frappe.utils import cint, getdate, to_timedelta
+
+STATUS_CODE_MAP = {
+    "Present": "P",
+    "Absent": "A",
+    "Half Day/Other Half Absent": "HD/A",
+    "Half Day/Other Half Present": "HD/P",
+    "Work From Home": "WFH",
+    "On Leave": "L",
+    "Holiday": "H",
+    "Weekly Off": "WO",
+    "No Punch": "NP",
+}
+
+# يُضبط بعد اكتمال أول backfill لـ Employee Day Summary؛ قبلها تُقرأ البصمات الخام
+DAY_SUMMARY_READY_KEY = "taj_employee_day_summary_ready"
+
+CHECKIN_YEARS_CACHE_KEY = "taj_checkin_year_range"
+
+# Redis hash: "YYYY-MM" -> جيل بيانات الشهر، "*" -> جيل عام (الموظفون، العطل، الورديات)
+MONTH_GENERATION_KEY = "taj_checkins_month_generation"
+
+
+class DayRecord(NamedTuple):
+    """
+    first_in / last_out: datetimes (a single punch fills only one of them)
+    span: hours between first_in and last_out (0.0 for a single punch), None without punches
+    code: status code (L/H/WO/P/A/...) for days without punches, None otherwise
+    """
+    first_in: datetime | None
+    last_out: datetime | None
+    span: float | None
+    code: str | None
+
+    @property
+    def display(self) -> str:
+        """Span as 'H.HH' for punched days, the status code otherwise."""
+        return f"{self.span:.2f}" if self.span is not None else self.code
+
+
+def get_month_generation(year: int, month: int) -> str:
+    """Generation of a month's checkin data; changes whenever a write touches that month."""
+    cache = frappe.cache()
+    month_gen, global_gen = cache.hmget(cache.make_key(MONTH_GENERATION_KEY), [f"{int(year):04d}-{int(month):02d}", "*"])
+    return f"{int(month_gen or 0)}.{int(global_gen or 0)}"
+
+
+def bump_month_generations(dates=None) -> None:
+    """Invalidate cached results of the months containing `dates` (every month when None)."""
+    fields = {"*"} if dates is None else {f"{d.year:04d}-{d.month:02d}" for d in dates}
+    if not fields:
+        return
+
+    def bump():
+        cache = frappe.cache()
+        for field in fields:
+            cache.hincrby(cache.make_key(MONTH_GENERATION_KEY), field, 1)
+
+    bump()
+    # قارئ متزامن قد يخزّن نتيجة ما قبل الـ commit تحت الجيل الجديد
+    frappe.db.after_commit.add(bump)
+
+
+def on_reference_change(doc=None, method=None):
+    """doc_events (Employee, Holiday List, Shift Type, Shift Assignment): data shown for every month may change."""
+    bump_month_generations()
+
+
+def get_checkin_year_range() -> tuple[int, int] | None:
+    """(first, last) checkin year from Redis; built from indexed MIN/MAX(`time`) on a miss."""
+    return frappe.cache().get_value(CHECKIN_YEARS_CACHE_KEY, generator=_build_checkin_year_range)
+
+
+def _build_checkin_year_range() -> tuple[int, int] | None:
+    first, last = frappe.db.sql("SELECT MIN(`time`), MAX(`time`) FROM `tabEmployee Checkin`")[0]
+    if not first:
+        return None
+    return getdate(first).year, getdate(last).year
+
+
+def extend_checkin_year_range(doc, method=None):
+    """doc_events (Employee Checkin after_insert): widen the cached range without querying."""
+    if not doc.time:
+        return
+    year = getdate(doc.time).year
+    year_range = frappe.cache().get_value(CHECKIN_YEARS_CACHE_KEY)
+    if year_range is None:
+        return  # يُبنى عند أول قراءة
+    first, last = year_range
+    if first <= year <= last:
+        return
+    frappe.cache().set_value(CHECKIN_YEARS_CACHE_KEY, (min(first, year), max(last, year)))
+
+
+def daterange(d1: date, d2: date):
+    cur = d1
+    while cur <= d2:
+        yield cur
+        cur = cur + timedelta(days=1)
+
+
+def get_employees(
+    employee: str | None = None,
+    department: str | None = None,
+    after: tuple[str, str] | None = None,
+    limit: int | None = None,
+) -> list:
+    """
+    Active employees ordered by (employee_name, name). `after` is the keyset cursor
+    (employee_name, name) of the previous page's last row; `limit` is the page size.
+    """
+    Employee = frappe.qb.DocType("Employee")
+    query = (
+        frappe.qb.from_(Employee)
+        .select(
+            Employee.name.as_("employee"), Employee.employee_name, Employee.company, Employee.branch,
+            Employee.grade, Employee.department, Employee.designation, Employee.holiday_list,
+        )
+        .where(Employee.status == "Active")
+        .orderby(Employee.employee_name)
+        .orderby(Employee.name)
+    )
+    if employee:
+        query = query.where(Employee.name == employee)
+    if department:
+        query = query.where(Employee.department == department)
+    if after:
+        after_name, after_id = after
+        query = query.where(
+            (Employee.employee_name > after_name)
+            | ((Employee.employee_name == after_name) & (Employee.name > after_id))
+        )
+    if limit:
+        query = query.limit(cint(limit))
+    return query.run(as_dict=True)
+
+
+def get_day_records(employees, dfrom: date, dto: date, classify_singles: bool = True) -> dict[str, list[DayRecord]]:
+    """
+    {employee: [DayRecord for each day dfrom..dto]} - computed once, rendered by any layout.
+    `employees` are rows from get_employees (need employee, company, holiday_list).
+    classify_singles=False skips shift resolution for layouts that only show the span
+    (a single punch is then reported as first_in).
+    """
+    if not employees:
+        return {}
+    emp_list = [e.employee for e in employees]
+
+    if frappe.db.get_global(DAY_SUMMARY_READY_KEY):
+        punches, attendance_code_map, leave_map = get_day_summaries(emp_list, dfrom, dto)
+    else:
+        punches = get_punch_aggregates(emp_list, dfrom, dto)
+        attendance_code_map = build_attendance_code_map(emp_list, dfrom, dto)
+        leave_map = get_leave_index(emp_list, dfrom, dto)
+    # العطل تُحسب وقت القراءة: قوائم العطل تتغير دون أحداث على الموظف
+    holiday_map = get_holiday_index(employees, dfrom, dto)
+
+    check_ins = None
+    if classify_singles:
+        singles = {key: agg["first_in"] for key, agg in punches.items() if cint(agg["punch_count"]) == 1}
+        check_ins = classify_single_punches(list({key[0] for key in singles}), dfrom, dto, singles)
+
+    out = {}
+    for emp_id in emp_list:
+        records = []
+        for d in daterange(dfrom, dto):
+            agg = punches.get((emp_id, d))
+            if agg:
+                records.append(punched_day_record(agg, check_ins is None or (emp_id, d) in check_ins))
+            else:
+                # لا توجد بصمات - تحديد الحالة
+                key = (emp_id, d)
+                holiday_code = holiday_map.get(key)
+                if key in leave_map:
+                    code = "L"
+                elif holiday_code:
+                    code = holiday_code
+                elif key in attendance_code_map:
+                    code = attendance_code_map[key]
+                else:
+                    code = "NP"
+                records.append(DayRecord(None, None, None, code))
+        out[emp_id] = records
+    return out
+
+
+def get_day_summaries(emp_list, dfrom: date, dto: date) -> tuple[dict, dict, dict]:
+    """(punches, attendance_code_map, leave_map) from Employee Day Summary in one indexed query."""
+    rows = frappe.db.sql(
+        """
+        SELECT employee, log_date, punch_count, first_in, last_out, on_leave, attendance_code
+        FROM `tabEmployee Day Summary`
+        WHERE employee IN %(emp_list)s
+          AND log_date >= %(dfrom)s AND log_date <= %(dto)s
+        """,
+        {"emp_list": emp_list, "dfrom": dfrom, "dto": dto},
+        as_dict=True,
+    )
+    punches, attendance_code_map, leave_map = {}, {}, {}
+    for r in rows:
+        key = (r["employee"], getdate(r["log_date"]))
+        if cint(r["punch_count"]):
+            punches[key] = r
+        if r["attendance_code"]:
+            attendance_code_map[key] = r["attendance_code"]
+        if cint(r["on_leave"]):
+            leave_map[key] = "L"
+    return punches, attendance_code_map, leave_map
+
+
+def get_punch_aggregates(emp_list, dfrom: date, dto: date) -> dict:
+    """
+    {(employee, date): row} - one row per employee-day, aggregated in SQL.
+    IN punches and untyped punches count for first_in, OUT and untyped for last_out;
+    when a day has none of either the first / last punch is used.
+    """
+    rows = frappe.db.sql(
+        """
+        SELECT
+            employee,
+            DATE(`time`) AS log_date,
+            COUNT(*) AS punch_count,
+            COALESCE(MIN(CASE WHEN log_type = 'OUT' THEN NULL ELSE `time` END), MIN(`time`)) AS first_in,
+            COALESCE(MAX(CASE WHEN log_type = 'IN' THEN NULL ELSE `time` END), MAX(`time`)) AS last_out
+        FROM `tabEmployee Checkin`
+        WHERE employee IN %(emp_list)s
+          AND `time` >= %(dfrom)s AND `time` < %(dto_next)s
+        GROUP BY employee, DATE(`time`)
+        """,
+        {"emp_list": emp_list, "dfrom": dfrom, "dto_next": dto + timedelta(days=1)},
+        as_dict=True,
+    )
+    return {(r["employee"], getdate(r["log_date"])): r for r in rows}
+
+
+def punched_day_record(agg, single_is_check_in: bool = True) -> DayRecord:
+    """Build the record from an aggregate row; a single punch fills first_in or last_out."""
+    if cint(agg["punch_count"]) == 1:
+        # حالة البصمة الواحدة: first_in و last_out هما نفس البصمة
+        if single_is_check_in:
+            return DayRecord(agg["first_in"], None, 0.0, None)
+        return DayRecord(None, agg["first_in"], 0.0, None)
+
+    # حساب المدة بين أول وآخر بصمة
+    span_hours = round((agg["last_out"] - agg["first_in"]).total_seconds() / 3600.0, 2)
+    return DayRecord(agg["first_in"], agg["last_out"], span_hours, None)
+
+
+# ------------ Shift Resolution ------------
+
+DAY_SECONDS = 24 * 3600
+DEFAULT_SHIFT_SECONDS = (8 * 3600, 17 * 3600)
+
+
+def _time_seconds(value) -> int | None:
+    if value in (None, ""):
+        return None
+    return int(to_timedelta(value).total_seconds()) % DAY_SECONDS
+
+
+class ShiftResolver:
+    """
+    (start, end) seconds-from-midnight of each employee's shift on a given day, loaded once
+    for an employee set and date range: submitted active Shift Assignments first, then
+    Employee.default_shift, then 08:00-17:00.
+    """
+
+    def __init__(self, emp_list, dfrom: date, dto: date):
+        self.shift_types = {}
+        for st in frappe.get_all("Shift Type", fields=["name", "start_time", "end_time"]):
+            start, end = _time_seconds(st.start_time), _time_seconds(st.end_time)
+            if start is not None and end is not None:
+                self.shift_types[st.name] = (start, end)
+
+        self.default_shift = {
+            e.name: self.shift_types.get(e.default_shift, DEFAULT_SHIFT_SECONDS)
+            for e in frappe.get_all("Employee", filters={"name": ["in", emp_list]}, fields=["name", "default_shift"])
+        }
+
+        # {employee: ([start_date...], [(start_date, end_date, shift)...])} مرتبة حسب البداية
+        self.assignments = defaultdict(lambda: ([], []))
+        ShiftAssignment = frappe.qb.DocType("Shift Assignment")
+        rows = (
+            frappe.qb.from_(ShiftAssignment)
+            .select(ShiftAssignment.employee, ShiftAssignment.shift_type, ShiftAssignment.start_date, ShiftAssignment.end_date)
+            .where(
+                (ShiftAssignment.docstatus == 1)
+                & (ShiftAssignment.status == "Active")
+                & (ShiftAssignment.employee.isin(emp_list))
+                & (ShiftAssignment.start_date <= dto)
+                & (ShiftAssignment.end_date.isnull() | (ShiftAssignment.end_date >= dfrom))
+            )
+            .orderby(ShiftAssignment.employee, ShiftAssignment.start_date)
+        ).run(as_dict=True)
+        for r in rows:
+            shift = self.shift_types.get(r.shift_type)
+            if not shift:
+                continue
+            starts, intervals = self.assignments[r.employee]
+            start_date = getdate(r.start_date)
+            starts.append(start_date)
+            intervals.append((start_date, getdate(r.end_date) if r.end_date else date.max, shift))
+
+    def resolve(self, emp_id, log_date: date) -> tuple[int, int]:
+        starts, intervals = self.assignments.get(emp_id, ((), ()))
+        # آخر تعيين بدأ قبل اليوم ولم ينتهِ بعد
+        i = bisect_right(starts, log_date) - 1
+        while i >= 0:
+            start_date, end_date, shift = intervals[i]
+            if end_date >= log_date:
+                return shift
+            i -= 1
+        return self.default_shift.get(emp_id, DEFAULT_SHIFT_SECONDS)
+
+
+def classify_single_punches(emp_list, dfrom: date, dto: date, singles: dict) -> set:
+    """
+    singles: {(employee, date): punch datetime}. Returns the keys whose punch is closer
+    to the shift start than to its end (i.e. a Check In); the rest are Check Outs.
+    """
+    if not singles:
+        return set()
+    resolver = ShiftResolver(emp_list, dfrom, dto)
+
+    check_ins = set()
+    for (emp_id, log_date), punch in singles.items():
+        start, end = resolver.resolve(emp_id, log_date)
+        t = punch.hour * 3600 + punch.minute * 60 + punch.second
+        if end < start:
+            # وردية ليلية: البصمة الصباحية تُحسب على اليوم التالي
+            end += DAY_SECONDS
+            if punch.hour < 12:
+                t += DAY_SECONDS
+        if abs(t - start) <= abs(t - end):
+            check_ins.add((emp_id, log_date))
+    return check_ins
+
+
+# ------------ Attendance & Holiday Helpers ------------
+
+def build_attendance_code_map(emp_list, dfrom: date, dto: date):
+    """(employee, date) -> code (P/A/HD/A/HD/P/WFH/L)."""
+    Attendance = frappe.qb.DocType("Attendance")
+    status_expr = (
+        Case()
+        .when(((Attendance.status == "Half Day") & (Attendance.half_day_status == "Present")),
+              "Half Day/Other Half Present")
+        .when(((Attendance.status == "Half Day") & (Attendance.half_day_status == "Absent")),
+              "Half Day/Other Half Absent")
+        .else_(Attendance.status)
+    )
+    rows = (
+        frappe.qb.from_(Attendance)
+        .select(Attendance.employee, Attendance.attendance_date, status_expr.as_("norm_status"))
+        .where(
+            (Attendance.docstatus == 1)
+            & (Attendance.employee.isin(emp_list))
+            & (Attendance.attendance_date >= dfrom)
+            & (Attendance.attendance_date <= dto)
+        )
+        .orderby(Attendance.employee, Attendance.attendance_date)
+    ).run(as_dict=True)
+
+    code_map = {}
+    for r in rows:
+        code = STATUS_CODE_MAP.get(r["norm_status"], None)
+        if code:
+            code_map[(r["employee"], getdate(r["attendance_date"]))] = code
+    return code_map
+
+
+class HolidayIndex:
+    """
+    Holidays kept once per holiday list as sorted dates (bisect lookup), plus each
+    employee's effective list - memory grows with lists x holidays, not employees.
+    """
+
+    def __init__(self, employee_lists: dict, list_holidays: dict):
+        self.employee_lists = employee_lists  # {employee: holiday_list}
+        self.list_holidays = list_holidays    # {holiday_list: ([dates], [codes])}
+
+    def get(self, key, default=None):
+        emp_id, d = key
+        dates, codes = self.list_holidays.get(self.employee_lists.get(emp_id), ((), ()))
+        i = bisect_left(dates, d)
+        if i < len(dates) and dates[i] == d:
+            return codes[i]
+        return default
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+
+class LeaveIndex:
+    """Approved leave per employee as merged, sorted (from, to) intervals clamped to [dfrom, dto]."""
+
+    def __init__(self, intervals: dict):
+        self.intervals = intervals  # {employee: ([starts], [ends])}
+
+    def __contains__(self, key) -> bool:
+        emp_id, d = key
+        starts, ends = self.intervals.get(emp_id, ((), ()))
+        i = bisect_right(starts, d) - 1
+        return i >= 0 and ends[i] >= d
+
+    def __iter__(self):
+        """Every (employee, date) on leave - for writers that need one row per day."""
+        for emp_id, (starts, ends) in self.intervals.items():
+            for start, end in zip(starts, ends):
+                for d in daterange(start, end):
+                    yield emp_id, d
+
+
+def get_holiday_index(employees, dfrom: date, dto: date) -> HolidayIndex:
+    companies = {e.company for e in employees if getattr(e, "company", None)}
+    default_lists = {}
+    for comp in companies:
+        try:
+            default_lists[comp] = frappe.get_cached_value("Company", comp, "default_holiday_list")
+        except Exception:
+            default_lists[comp] = None
+
+    employee_lists = {}
+    for e in employees:
+        hl = e.holiday_list or default_lists.get(e.company)
+        if hl:
+            employee_lists[e.employee] = hl
+
+    list_holidays = {}
+    if employee_lists:
+        Holiday = frappe.qb.DocType("Holiday")
+        rows = (
+            frappe.qb.from_(Holiday)
+            .select(Holiday.parent, Holiday.holiday_date, Holiday.weekly_off)
+            .where(
+                (Holiday.parent.isin(list(set(employee_lists.values()))))
+                & (Holiday.holiday_date >= dfrom)
+                & (Holiday.holiday_date <= dto)
+            )
+            .orderby(Holiday.parent, Holiday.holiday_date)
+        ).run(as_dict=True)
+        for r in rows:
+            dates, codes = list_holidays.setdefault(r["parent"], ([], []))
+            dates.append(getdate(r["holiday_date"]))
+            codes.append("WO" if cint(r.get("weekly_off")) else "H")
+    return HolidayIndex(employee_lists, list_holidays)
+
+
+def get_leave_index(emp_list, dfrom: date, dto: date) -> LeaveIndex:
+    LeaveApplication = frappe.qb.DocType("Leave Application")
+
+    # تداخل الفترات: يشمل الإجازات التي تغطي الفترة كاملة أو تعبر حدود الشهر/السنة
+    rows = (
+        frappe.qb.from_(LeaveApplication)
+        .select(LeaveApplication.employee, LeaveApplication.from_date, LeaveApplication.to_date)
+        .where(
+            (LeaveApplication.docstatus == 1)
+            & (LeaveApplication.employee.isin(emp_list))
+            & (LeaveApplication.status == "Approved")
+            & (LeaveApplication.from_date <= dto)
+            & (LeaveApplication.to_date >= dfrom)
+        )
+        .orderby(LeaveApplication.employee, LeaveApplication.from_date)
+    ).run(as_dict=True)
+
+    intervals = {}
+    for r in rows:
+        start = max(getdate(r["from_date"]), dfrom)
+        end = min(getdate(r["to_date"]), dto)
+        starts, ends = intervals.setdefault(r["employee"], ([], []))
+        # دمج الإجازات المتداخلة أو المتلاصقة ليبقى bisect صحيحاً
+        if ends and start <= ends[-1] + timedelta(days=1):
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return LeaveIndex(intervals)
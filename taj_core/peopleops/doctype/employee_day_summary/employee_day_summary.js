@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Maged Bajandooh and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Employee Day Summary", {
+// 	refresh(frm) {
+
+// 	},
+// });
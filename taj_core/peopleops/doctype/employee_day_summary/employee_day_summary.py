@@ -0,0 +1,194 @@
+# Copyright (c) 2026, Maged Bajandooh and contributors
+# For license information, please see license.txt
+
+from collections import defaultdict
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, get_first_day, get_last_day, getdate, now, today
+
+from taj_core.peopleops.checkin_engine import (
+	DAY_SUMMARY_READY_KEY,
+	build_attendance_code_map,
+	bump_month_generations,
+	daterange,
+	get_leave_index,
+	get_punch_aggregates,
+)
+
+SUMMARY_BATCH_SIZE = 500
+SUMMARY_FIELDS = ["punch_count", "first_in", "last_out", "span_hours", "on_leave", "attendance_code"]
+
+
+class EmployeeDaySummary(Document):
+	"""Read-only row per (employee, day); written only by refresh_day_summaries / the backfill."""
+
+	pass
+
+
+def summary_name(employee, log_date) -> str:
+	return f"{employee}-{getdate(log_date)}"
+
+
+def refresh_day_summaries(pairs) -> int:
+	"""Recompute the summary rows of the given (employee, date) pairs. Returns the number of rows written."""
+	by_employee = defaultdict(set)
+	for employee, log_date in pairs or []:
+		if employee and log_date:
+			by_employee[employee].add(getdate(log_date))
+	if not by_employee:
+		return 0
+
+	dates = set().union(*by_employee.values())
+	only = {(employee, d) for employee, ds in by_employee.items() for d in ds}
+	written = _summarize(list(by_employee), min(dates), max(dates), only)
+	bump_month_generations(dates)
+	return written
+
+
+def _summarize(emp_list, dfrom, dto, only=None) -> int:
+	"""
+	Build the rows of emp_list x [dfrom, dto] (restricted to `only` when given) from
+	punches, submitted attendance and approved leave, then replace them in the table.
+	Days with none of the three have no row.
+	"""
+	punches = get_punch_aggregates(emp_list, dfrom, dto)
+	attendance_code_map = build_attendance_code_map(emp_list, dfrom, dto)
+	leave_map = get_leave_index(emp_list, dfrom, dto)
+
+	keys = set(punches) | set(attendance_code_map) | set(leave_map)
+	if only is not None:
+		keys &= only
+
+	rows = {}
+	for key in keys:
+		agg = punches.get(key)
+		punch_count = agg["punch_count"] if agg else 0
+		span_hours = None
+		if punch_count > 1:
+			span_hours = round((agg["last_out"] - agg["first_in"]).total_seconds() / 3600.0, 2)
+		elif punch_count == 1:
+			span_hours = 0.0
+		rows[key] = {
+			"punch_count": punch_count,
+			"first_in": agg["first_in"] if agg else None,
+			"last_out": agg["last_out"] if agg else None,
+			"span_hours": span_hours,
+			"on_leave": 1 if key in leave_map else 0,
+			"attendance_code": attendance_code_map.get(key),
+		}
+
+	# الأيام التي لم يعد لها بصمات أو حضور أو إجازة
+	if only is None:
+		frappe.db.delete(
+			"Employee Day Summary",
+			{"employee": ["in", emp_list], "log_date": ["between", [dfrom, dto]]},
+		)
+	else:
+		stale = [summary_name(*key) for key in only - keys]
+		if stale:
+			frappe.db.delete("Employee Day Summary", {"name": ["in", stale]})
+
+	if rows:
+		_upsert(rows)
+	return len(rows)
+
+
+def _upsert(rows: dict):
+	timestamp, user = now(), frappe.session.user
+	columns = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", "employee", "log_date", *SUMMARY_FIELDS]
+	values, params = [], []
+	for (employee, log_date), row in rows.items():
+		values.append("(" + ", ".join(["%s"] * len(columns)) + ")")
+		params.extend([summary_name(employee, log_date), timestamp, timestamp, user, user, 0, 0, employee, log_date])
+		params.extend(row[field] for field in SUMMARY_FIELDS)
+
+	updates = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in ["modified", "modified_by", *SUMMARY_FIELDS])
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabEmployee Day Summary` ({", ".join(f"`{c}`" for c in columns)})
+		VALUES {", ".join(values)}
+		ON DUPLICATE KEY UPDATE {updates}
+		""",
+		params,
+	)
+
+
+# ------------ doc_events ------------
+
+def on_checkin_change(doc, method=None):
+	"""doc_events (Employee Checkin): after_insert / on_update / after_delete."""
+	pairs = {(doc.employee, getdate(doc.time))} if doc.time else set()
+	if method == "on_update":
+		previous = doc.get_doc_before_save()
+		# after_insert يغطي الإدخال؛ هنا فقط تعديل الوقت أو الموظف أو النوع
+		if not previous:
+			return
+		if (previous.employee, str(previous.time), previous.log_type) == (doc.employee, str(doc.time), doc.log_type):
+			return
+		if previous.time:
+			pairs.add((previous.employee, getdate(previous.time)))
+	refresh_day_summaries(pairs)
+
+
+def on_attendance_change(doc, method=None):
+	"""doc_events (Attendance): on_submit / on_cancel."""
+	refresh_day_summaries([(doc.employee, doc.attendance_date)])
+
+
+def on_leave_change(doc, method=None):
+	"""doc_events (Leave Application): on_submit / on_cancel."""
+	if not (doc.from_date and doc.to_date):
+		return
+	refresh_day_summaries(
+		(doc.employee, d) for d in daterange(getdate(doc.from_date), getdate(doc.to_date))
+	)
+
+
+# ------------ Backfill ------------
+
+@frappe.whitelist()
+def rebuild_day_summaries(from_date=None, to_date=None):
+	"""Backfill / repair in a background job; the report switches to the table once a full rebuild finishes."""
+	frappe.only_for(("System Manager", "HR Manager"))
+	frappe.enqueue(
+		"taj_core.peopleops.doctype.employee_day_summary.employee_day_summary._rebuild_day_summaries",
+		queue="long",
+		timeout=4 * 3600,
+		job_id=f"taj_rebuild_day_summaries::{from_date}::{to_date}",
+		deduplicate=True,
+		from_date=from_date,
+		to_date=to_date,
+	)
+	return "queued"
+
+
+def _rebuild_day_summaries(from_date=None, to_date=None) -> int:
+	full = not from_date and not to_date
+	if not from_date:
+		first_punch = frappe.db.sql("SELECT MIN(`time`) FROM `tabEmployee Checkin`")[0][0]
+		first_attendance = frappe.db.sql("SELECT MIN(attendance_date) FROM `tabAttendance` WHERE docstatus = 1")[0][0]
+		starts = [getdate(x) for x in (first_punch, first_attendance) if x]
+		if not starts:
+			if full:
+				frappe.db.set_global(DAY_SUMMARY_READY_KEY, 1)
+			return 0
+		from_date = min(starts)
+	dfrom, dto = getdate(from_date), getdate(to_date or today())
+
+	employees = frappe.get_all("Employee", pluck="name", order_by="name asc")
+	total = 0
+	month_start = get_first_day(dfrom)
+	while month_start <= dto:
+		start = max(month_start, dfrom)
+		end = min(getdate(get_last_day(month_start)), dto)
+		for i in range(0, len(employees), SUMMARY_BATCH_SIZE):
+			total += _summarize(employees[i : i + SUMMARY_BATCH_SIZE], start, end)
+			frappe.db.commit()
+		month_start = getdate(add_days(end, 1))
+
+	if full:
+		frappe.db.set_global(DAY_SUMMARY_READY_KEY, 1)
+		frappe.db.commit()
+	bump_month_generations()
+	return total
@@ -1,4 +1,14 @@
 /* eslint-disable */
+// تغيير الفترة أو الموظف أو القسم يعيد الصفحات للبداية (مؤشر قديم قد يتخطى الصفحة الأولى)
+function taj_reset_checkins_page() {
+  const report = frappe.query_report;
+  if (report.get_filter_value("after")) {
+    report.set_filter_value("after", "");
+  } else {
+    report.refresh();
+  }
+}
+
 frappe.query_reports["Employee First Last Checkins"] = {
   filters: [
     {
@@ -17,7 +27,13 @@ frappe.query_reports["Employee First Last Checkins"] = {
       default: new Date().getMonth() + 1,
     },
     { fieldname: "year", label: __("Year"), fieldtype: "Select", reqd: 1 },
-    { fieldname: "employee", label: __("Employee"), fieldtype: "Link", options: "Employee" },
+    { fieldname: "employee", label: __("Employee"), fieldtype: "Link", options: "Employee", on_change: taj_reset_checkins_page },
+    { fieldname: "department", label: __("Department"), fieldtype: "Link", options: "Department", on_change: taj_reset_checkins_page },
+    // وضع الفترة الحرة: يتجاوز الشهر/السنة ويعرض الموظفين على صفحات
+    { fieldname: "from_date", label: __("From Date"), fieldtype: "Date", on_change: taj_reset_checkins_page },
+    { fieldname: "to_date", label: __("To Date"), fieldtype: "Date", on_change: taj_reset_checkins_page },
+    { fieldname: "page_size", label: __("Employees per Page"), fieldtype: "Int", default: 200, depends_on: "eval:doc.from_date", on_change: taj_reset_checkins_page },
+    { fieldname: "after", label: __("After"), fieldtype: "Data", hidden: 1 },
     { fieldname: "group_by", label: __("Group By"), fieldtype: "Select", options: ["", "Branch", "Grade", "Department", "Designation"], default: "" },
     {
       fieldname: "show_horizontal",
@@ -27,10 +43,52 @@ frappe.query_reports["Employee First Last Checkins"] = {
     }
   ],
 
-  onload: function () {
-    // Use HRMS helper to populate years
+  onload: function (report) {
+    // تصدير الجدول الأفقي في الخلفية - مناسب للشركات الكبيرة
+    report.page.add_inner_button(__("Export Sheet (Background)"), function () {
+      frappe.prompt(
+        { fieldname: "file_format", label: __("Format"), fieldtype: "Select", options: ["CSV", "Excel"], default: "Excel", reqd: 1 },
+        (values) => {
+          frappe.call({
+            method: "taj_core.peopleops.report.employee_first_last_checkins.employee_first_last_checkins.export_horizontal_sheet",
+            args: { filters: report.get_values(), file_format: values.file_format },
+            callback: () => frappe.show_alert({ message: __("Export started. You will be notified when the file is ready."), indicator: "blue" }),
+          });
+        },
+        __("Export Sheet")
+      );
+    });
+
+    // صفحات الموظفين (keyset): المؤشر هو (الاسم، الرقم) لآخر موظف في الصفحة الحالية
+    report.page.add_inner_button(__("Next Page"), function () {
+      if (!report.get_filter_value("from_date")) {
+        frappe.msgprint(__("Paging is available when From Date and To Date are set."));
+        return;
+      }
+      // المؤشر يأتي من الخادم: آخر موظف في الصفحة حسب ترتيب قاعدة البيانات
+      const cursor = ((report.data || [])[0] || {}).taj_next_after;
+      if (!cursor) {
+        frappe.show_alert({ message: __("This is the last page."), indicator: "blue" });
+        return;
+      }
+      report.set_filter_value("after", cursor);
+    });
+    report.page.add_inner_button(__("First Page"), function () {
+      report.set_filter_value("after", "");
+    });
+
+    frappe.realtime.off("taj_checkins_export_ready");
+    frappe.realtime.on("taj_checkins_export_ready", (data) => {
+      frappe.msgprint({
+        title: __("Export Ready"),
+        message: `<a href="${data.file_url}" target="_blank">${__("Download the checkins sheet")}</a>`,
+        indicator: "green",
+      });
+    });
+
+    // سنوات البصمات من النطاق المخزّن مؤقتاً (بدون DISTINCT YEAR على جدول البصمات)
     frappe.call({
-      method: "hrms.hr.report.monthly_attendance_sheet.monthly_attendance_sheet.get_attendance_years",
+      method: "taj_core.peopleops.report.employee_first_last_checkins.employee_first_last_checkins.get_years_for_checkins",
       callback: function (r) {
         const year_filter = frappe.query_report.get_filter("year");
         const years = (r.message || "").toString();
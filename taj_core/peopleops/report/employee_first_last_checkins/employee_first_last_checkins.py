@@ -2,32 +2,48 @@
 from __future__ import annotations
 
 import calendar
+import csv
+import json
 from collections import defaultdict
 from datetime import date, datetime, timedelta
 
 import frappe
 from frappe import _
-from frappe.query_builder import Case
-from frappe.query_builder.functions import Extract
+from frappe.desk.doctype.notification_log.notification_log import enqueue_create_notification
 from frappe.utils import cint, getdate, now_datetime
 
+from taj_core.peopleops.checkin_engine import (
+    daterange,
+    get_checkin_year_range,
+    get_day_records,
+    get_employees,
+    get_month_generation,
+)
+
+MONTH_CACHE_PREFIX = "taj_checkins_report"
+MONTH_CACHE_TTL = 7 * 24 * 3600
+EXPORT_PAGE_SIZE = 200
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+MAX_RANGE_DAYS = 366
+EXPORT_FORMATS = {"CSV": "csv", "Excel": "xlsx"}
+
 # ------------ Entry Point ------------
 
 def execute(filters=None):
     f = frappe._dict(filters or {})
     normalize_filters(f)
 
-    start_date, end_date, mode = month_effective_range(f.year, f.month)
+    start_date, end_date, mode = effective_range(f)
     if start_date is None:
         return get_columns(f), [], message_for_mode(mode), None
 
     columns = get_columns(f)
-    
-    if f.get("show_horizontal"):
-        data = get_horizontal_data(f, start_date, end_date)
-    else:
-        data = get_data(f, start_date, end_date)
-        
+    data = get_report_data(f, start_date, end_date, mode)
+    if f.get("next_after") and data:
+        # يقرأه زر Next Page في JS
+        data[0]["taj_next_after"] = json.dumps(f.next_after)
+
     message = legend_message() + (" " + message_for_mode(mode) if mode else "")
     return columns, data, message, None
 
@@ -44,6 +60,37 @@ def normalize_filters(f):
     if f.month < 1 or f.month > 12:
         frappe.throw(_("Month must be 1..12"))
 
+    # وضع الفترة الحرة: from_date / to_date بدل الشهر، مع صفحات من الموظفين
+    if f.get("from_date") or f.get("to_date"):
+        if not (f.get("from_date") and f.get("to_date")):
+            frappe.throw(_("Set both From Date and To Date, or neither"))
+        f.from_date, f.to_date = getdate(f.from_date), getdate(f.to_date)
+        if f.from_date > f.to_date:
+            frappe.throw(_("From Date must be before To Date"))
+        if (f.to_date - f.from_date).days >= MAX_RANGE_DAYS:
+            frappe.throw(_("Date range cannot exceed {0} days").format(MAX_RANGE_DAYS))
+        f.page_size = min(cint(f.get("page_size")) or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        after = frappe.parse_json(f.after) if isinstance(f.get("after"), str) and f.after else f.get("after")
+        f.after = tuple(after) if after else None
+
+def is_range_mode(f) -> bool:
+    return bool(f.get("from_date"))
+
+def effective_range(f) -> tuple[date|None, date|None, str]:
+    if not is_range_mode(f):
+        return month_effective_range(f.year, f.month)
+    today = getdate(now_datetime())
+    if f.from_date > today:
+        return None, None, "future"
+    if f.to_date >= today:
+        return f.from_date, today, "range_current"
+    return f.from_date, f.to_date, "range"
+
+def column_range(f) -> tuple[date, date]:
+    if is_range_mode(f):
+        return f.from_date, f.to_date
+    return month_range_full(f.year, f.month)
+
 def month_range_full(year: int, month: int) -> tuple[date, date]:
     last_day = calendar.monthrange(int(year), int(month))[1]
     return date(int(year), int(month), 1), date(int(year), int(month), last_day)
@@ -71,7 +118,10 @@ def message_for_mode(mode: str) -> str:
     if mode == "past":
         return "<span style='color:#6b7280'>Showing full month.</span>"
     if mode == "future":
-        return "<span style='color:#6b7280'>Selected month is in the future — no data.</span>"
+        return "<span style='color:#6b7280'>Selected period is in the future — no data.</span>"
+    if mode in ("range", "range_current"):
+        through = " through today" if mode == "range_current" else ""
+        return f"<span style='color:#6b7280'>Showing selected range{through}, up to {DEFAULT_PAGE_SIZE} employees per page by default; use Next Page to continue.</span>"
     return ""
 
 
@@ -138,12 +188,13 @@ def get_horizontal_columns(f):
     ])
 
     # إضافة أعمدة الأيام
-    start_date, end_date = month_range_full(f.year, f.month)
+    start_date, end_date = column_range(f)
     current_date = start_date
     day_number = 1
     
     while current_date <= end_date:
-        day_label = f"{day_number}" #f"{day_number}/{f.month}"
+        # في وضع الفترة الحرة قد تمتد الأعمدة على أكثر من شهر
+        day_label = f"{current_date.day}/{current_date.month}" if is_range_mode(f) else f"{day_number}"
         day_fieldname = f"day_{day_number:02d}"
         
         cols.append({
@@ -174,479 +225,204 @@ def fmt_time(val) -> str | None:
 
 # ------------ Data Assembly ------------
 
-STATUS_CODE_MAP = {
-    "Present": "P",
-    "Absent": "A",
-    "Half Day/Other Half Absent": "HD/A",
-    "Half Day/Other Half Present": "HD/P",
-    "Work From Home": "WFH",
-    "On Leave": "L",
-    "Holiday": "H",
-    "Weekly Off": "WO",
-    "No Punch": "NP",
-}
-
-def daterange(d1: date, d2: date):
-    cur = d1
-    while cur <= d2:
-        yield cur
-        cur = cur + timedelta(days=1)
-
-def get_shift_info_for_employee(emp_id, log_date):
-    """دالة ذكية لتحديد إذا كانت البصمة الواحدة أقرب لـ Check In أو Check Out"""
-    try:
-        emp = frappe.get_cached_value("Employee", emp_id, ["default_shift", "company"], as_dict=1)
-        
-        if emp and emp.default_shift:
-            shift_times = frappe.get_cached_value("Shift Type", emp.default_shift, 
-                                                ["start_time", "end_time"], as_dict=1)
-            if shift_times and shift_times.start_time and shift_times.end_time:
-                return shift_times.start_time, shift_times.end_time
-        
-        return "08:00:00", "17:00:00"
-    except Exception:
-        return "08:00:00", "17:00:00"
-
-def classify_single_checkin(checkin_time, emp_id, log_date):
-    """تصنيف البصمة الواحدة إلى Check In أو Check Out بناءً على الوقت"""
-    try:
-        if isinstance(checkin_time, str):
-            checkin_dt = frappe.utils.get_datetime(checkin_time)
-        else:
-            checkin_dt = checkin_time
-        
-        shift_start_str, shift_end_str = get_shift_info_for_employee(emp_id, log_date)
-        
-        shift_start = frappe.utils.get_datetime(f"{log_date} {shift_start_str}")
-        shift_end = frappe.utils.get_datetime(f"{log_date} {shift_end_str}")
-        
-        if shift_end < shift_start:
-            shift_end += timedelta(days=1)
-            if checkin_dt.hour < 12:
-                checkin_dt += timedelta(days=1)
-        
-        distance_from_start = abs((checkin_dt - shift_start).total_seconds())
-        distance_from_end = abs((checkin_dt - shift_end).total_seconds())
-        
-        if distance_from_start <= distance_from_end:
-            return "check_in", checkin_time
-        else:
-            return "check_out", checkin_time
-            
-    except Exception:
-        checkin_hour = checkin_time.hour if hasattr(checkin_time, 'hour') else checkin_dt.hour
-        if checkin_hour < 12:
-            return "check_in", checkin_time
-        else:
-            return "check_out", checkin_time
-
-def get_data(f, dfrom: date, dto: date):
-    emp_filters = {"status": "Active"}
-    if f.get("employee"):
-        emp_filters["name"] = f.employee
-
-    employees = frappe.get_all(
-        "Employee",
-        fields=["name as employee", "employee_name", "company", "branch", "grade", "department", "designation", "holiday_list"],
-        filters=emp_filters,
-        order_by="employee_name asc",
-    )
-    if not employees:
-        return []
-
-    emp_map = {e.employee: e for e in employees}
-    emp_list = [e.employee for e in employees]
-
-    # جلب بيانات البصمات
-    checkins = frappe.db.sql(
-        """
-        SELECT
-            employee,
-            employee_name,
-            DATE(`time`) AS log_date,
-            `time` AS log_time,
-            log_type
-        FROM `tabEmployee Checkin`
-        WHERE employee IN %(emp_list)s
-          AND DATE(`time`) BETWEEN %(dfrom)s AND %(dto)s
-        ORDER BY employee, DATE(`time`), `time`
-        """,
-        {"emp_list": emp_list, "dfrom": dfrom, "dto": dto},
-        as_dict=True,
+def get_report_data(f, dfrom: date, dto: date, mode: str):
+    """Past months are immutable until a write bumps their generation, so their rows are cached."""
+    build = get_horizontal_data if f.get("show_horizontal") else get_data
+    if mode != "past":
+        return build(f, dfrom, dto)
+
+    key = "::".join([
+        MONTH_CACHE_PREFIX,
+        f"{f.year:04d}-{f.month:02d}",
+        get_month_generation(f.year, f.month),
+        f.get("employee") or "",
+        f.get("department") or "",
+        f.get("group_by") or "",
+        "h" if f.get("show_horizontal") else "v",
+    ])
+    data = frappe.cache().get_value(key)
+    if data is None:
+        data = build(f, dfrom, dto)
+        frappe.cache().set_value(key, data, expires_in_sec=MONTH_CACHE_TTL)
+    return data
+
+def get_report_employees(f, paginate: bool = True) -> list:
+    """Report employees; in range mode one keyset page (page_size rows after the `after` cursor)."""
+    paged = paginate and is_range_mode(f)
+    employees = get_employees(
+        f.get("employee"),
+        f.get("department"),
+        after=f.get("after") if paged else None,
+        limit=f.page_size if paged else None,
     )
-
-    per_day = defaultdict(list)
-    for r in checkins:
-        per_day[(r["employee"], r["log_date"])].append(r)
-
-    attendance_code_map = build_attendance_code_map(emp_list, f.year, f.month)
-    holiday_map = get_holiday_map_per_employee(employees, f.year, f.month)
-    leave_map = get_leave_map_per_employee(emp_list, f.year, f.month)
-
+    # مؤشر الصفحة التالية من ترتيب قاعدة البيانات (لا من ترتيب العرض بعد Group By)
+    if paged and len(employees) == f.page_size:
+        last = employees[-1]
+        f.next_after = [last.employee_name, last.employee]
+    return employees
+
+def iter_employee_groups(f, employees):
+    """Yield (group_row | None, [employee rows]) in report order."""
     group_by = f.get("group_by")
-    rows = []
+    if not group_by:
+        yield None, employees
+        return
 
-    def emit_row(emp_id, log_date, items_for_day=None):
-        emp_doc = emp_map[emp_id]
-
-        # تهيئة القيم الافتراضية
-        check_in_time = None
-        check_out_time = None
-        display_value = "0.00"
-
-        if items_for_day and len(items_for_day) > 0:
-            sorted_checkins = sorted(items_for_day, key=lambda x: x["log_time"])
-            
-            if len(sorted_checkins) == 1:
-                # حالة البصمة الواحدة
-                single_checkin = sorted_checkins[0]
-                checkin_type, checkin_time = classify_single_checkin(
-                    single_checkin["log_time"], emp_id, log_date
-                )
-                
-                if checkin_type == "check_in":
-                    check_in_time = fmt_time(checkin_time)
-                else:
-                    check_out_time = fmt_time(checkin_time)
-                
-                display_value = "0.00"
-                
-            else:
-                # حالات متعددة البصمات
-                in_times = []
-                out_times = []
-                
-                for it in sorted_checkins:
-                    log_type = (it.get("log_type") or "").upper()
-                    if log_type == "IN":
-                        in_times.append(it["log_time"])
-                    elif log_type == "OUT":
-                        out_times.append(it["log_time"])
-                    else:
-                        # إذا لم يكن هناك log_type، إضافة إلى كلا القائمتين
-                        in_times.append(it["log_time"])
-                        out_times.append(it["log_time"])
-                
-                # تحديد أول بصمة كـ Check In
-                if in_times:
-                    check_in_dt = min(in_times)
-                    check_in_time = fmt_time(check_in_dt)
-                elif sorted_checkins:
-                    check_in_dt = sorted_checkins[0]["log_time"]
-                    check_in_time = fmt_time(check_in_dt)
-                
-                # تحديد آخر بصمة كـ Check Out
-                if out_times:
-                    check_out_dt = max(out_times)
-                    check_out_time = fmt_time(check_out_dt)
-                elif sorted_checkins:
-                    check_out_dt = sorted_checkins[-1]["log_time"]
-                    check_out_time = fmt_time(check_out_dt)
-                
-                # حساب المدة بين أول وآخر بصمة
-                if check_in_dt and check_out_dt:
-                    time_diff = check_out_dt - check_in_dt
-                    span_hours = round(time_diff.total_seconds() / 3600.0, 2)
-                    display_value = f"{span_hours:.2f}"
-                else:
-                    display_value = "0.00"
-                    
-        else:
-            # لا توجد بصمات - تحديد الحالة
-            if (emp_id, log_date) in leave_map:
-                display_value = "L"
-            elif (emp_id, log_date) in holiday_map:
-                display_value = holiday_map[(emp_id, log_date)]
-            elif (emp_id, log_date) in attendance_code_map:
-                display_value = attendance_code_map[(emp_id, log_date)]
-            else:
-                display_value = "NP"
-
-        rows.append({
-            "employee": emp_id,
-            "employee_name": emp_doc.employee_name,
-            "log_date": log_date,
-            "check_in": check_in_time,
-            "check_out": check_out_time,
-            "span_hours": display_value,
-            "branch": emp_doc.branch,
-            "grade": emp_doc.grade,
-            "department": emp_doc.department,
-            "designation": emp_doc.designation,
-        })
+    keyname = frappe.scrub(group_by)
+    groups = defaultdict(list)
+    for e in employees:
+        groups[(getattr(e, keyname) or "")].append(e)
+    for group_value in sorted(groups.keys(), key=lambda x: (str(x).lower())):
+        yield {keyname: group_value}, sorted(groups[group_value], key=lambda e: e.employee_name or "")
+
+def employee_columns(emp_doc) -> dict:
+    return {
+        "employee": emp_doc.employee,
+        "employee_name": emp_doc.employee_name,
+        "branch": emp_doc.branch,
+        "grade": emp_doc.grade,
+        "department": emp_doc.department,
+        "designation": emp_doc.designation,
+    }
 
-    if group_by:
-        keyname = frappe.scrub(group_by)
-        groups = defaultdict(list)
-        for e in employees:
-            groups[(getattr(e, keyname) or "")].append(e.employee)
-        for group_value in sorted(groups.keys(), key=lambda x: (str(x).lower())):
-            rows.append({keyname: group_value})
-            for emp_id in sorted(groups[group_value], key=lambda eid: emp_map[eid].employee_name or ""):
-                for d in daterange(dfrom, dto):
-                    items = per_day.get((emp_id, d))
-                    emit_row(emp_id, d, items)
-    else:
-        for emp_id in emp_list:
-            for d in daterange(dfrom, dto):
-                items = per_day.get((emp_id, d))
-                emit_row(emp_id, d, items)
+def get_data(f, dfrom: date, dto: date):
+    employees = get_report_employees(f)
+    records = get_day_records(employees, dfrom, dto)
 
+    rows = []
+    for group_row, group_employees in iter_employee_groups(f, employees):
+        if group_row:
+            rows.append(group_row)
+        for emp_doc in group_employees:
+            base = employee_columns(emp_doc)
+            for log_date, rec in zip(daterange(dfrom, dto), records[emp_doc.employee]):
+                rows.append({
+                    **base,
+                    "log_date": log_date,
+                    "check_in": fmt_time(rec.first_in),
+                    "check_out": fmt_time(rec.last_out),
+                    "span_hours": rec.display,
+                })
     return rows
 
 def get_horizontal_data(f, dfrom: date, dto: date):
     """إنشاء بيانات العرض الأفقي"""
-    emp_filters = {"status": "Active"}
-    if f.get("employee"):
-        emp_filters["name"] = f.employee
-
-    employees = frappe.get_all(
-        "Employee",
-        fields=["name as employee", "employee_name", "company", "branch", "grade", "department", "designation", "holiday_list"],
-        filters=emp_filters,
-        order_by="employee_name asc",
-    )
-    if not employees:
-        return []
-
-    emp_map = {e.employee: e for e in employees}
-    emp_list = [e.employee for e in employees]
-
-    # جلب بيانات البصمات
-    checkins = frappe.db.sql(
-        """
-        SELECT
-            employee,
-            employee_name,
-            DATE(`time`) AS log_date,
-            `time` AS log_time,
-            log_type
-        FROM `tabEmployee Checkin`
-        WHERE employee IN %(emp_list)s
-          AND DATE(`time`) BETWEEN %(dfrom)s AND %(dto)s
-        ORDER BY employee, DATE(`time`), `time`
-        """,
-        {"emp_list": emp_list, "dfrom": dfrom, "dto": dto},
-        as_dict=True,
-    )
-
-    per_day = defaultdict(list)
-    for r in checkins:
-        per_day[(r["employee"], r["log_date"])].append(r)
+    employees = get_report_employees(f)
+    records = get_day_records(employees, dfrom, dto, classify_singles=False)
 
-    attendance_code_map = build_attendance_code_map(emp_list, f.year, f.month)
-    holiday_map = get_holiday_map_per_employee(employees, f.year, f.month)
-    leave_map = get_leave_map_per_employee(emp_list, f.year, f.month)
-
-    group_by = f.get("group_by")
     rows = []
+    for group_row, group_employees in iter_employee_groups(f, employees):
+        if group_row:
+            rows.append(group_row)
+        for emp_doc in group_employees:
+            rows.append(horizontal_row(emp_doc, records[emp_doc.employee]))
+    return rows
 
-    def get_span_value(emp_id, log_date, items_for_day):
-        """دالة مساعدة لحساب قيمة الـ Span فقط"""
-        if items_for_day and len(items_for_day) > 0:
-            sorted_checkins = sorted(items_for_day, key=lambda x: x["log_time"])
-            
-            if len(sorted_checkins) == 1:
-                return "0.00"
-            else:
-                in_times = []
-                out_times = []
-                
-                for it in sorted_checkins:
-                    log_type = (it.get("log_type") or "").upper()
-                    if log_type == "IN":
-                        in_times.append(it["log_time"])
-                    elif log_type == "OUT":
-                        out_times.append(it["log_time"])
-                    else:
-                        in_times.append(it["log_time"])
-                        out_times.append(it["log_time"])
-                
-                # تحديد أول وآخر بصمة
-                check_in_dt = min(in_times) if in_times else sorted_checkins[0]["log_time"]
-                check_out_dt = max(out_times) if out_times else sorted_checkins[-1]["log_time"]
-                
-                # حساب المدة
-                if check_in_dt and check_out_dt:
-                    time_diff = check_out_dt - check_in_dt
-                    span_hours = round(time_diff.total_seconds() / 3600.0, 2)
-                    return f"{span_hours:.2f}"
-                else:
-                    return "0.00"
-        else:
-            # لا توجد بصمات - تحديد الحالة
-            if (emp_id, log_date) in leave_map:
-                return "L"
-            elif (emp_id, log_date) in holiday_map:
-                return holiday_map[(emp_id, log_date)]
-            elif (emp_id, log_date) in attendance_code_map:
-                return attendance_code_map[(emp_id, log_date)]
-            else:
-                return "NP"
-
-    # إنشاء بيانات لكل موظف
-    def create_employee_row(emp_id):
-        emp_doc = emp_map[emp_id]
-        row = {
-            "employee": emp_id,
-            "employee_name": emp_doc.employee_name,
-            "branch": emp_doc.branch,
-            "grade": emp_doc.grade,
-            "department": emp_doc.department,
-            "designation": emp_doc.designation,
-        }
+def horizontal_row(emp_doc, records) -> dict:
+    row = employee_columns(emp_doc)
+    # إضافة بيانات كل يوم
+    for day_number, rec in enumerate(records, start=1):
+        row[f"day_{day_number:02d}"] = rec.display
+    return row
 
-        # إضافة بيانات كل يوم
-        current_date = dfrom
-        day_number = 1
-        
-        while current_date <= dto:
-            day_fieldname = f"day_{day_number:02d}"
-            items = per_day.get((emp_id, current_date))
-            
-            span_value = get_span_value(emp_id, current_date, items)
-            row[day_fieldname] = span_value
-            
-            current_date += timedelta(days=1)
-            day_number += 1
-
-        return row
-
-    if group_by:
-        keyname = frappe.scrub(group_by)
-        groups = defaultdict(list)
-        for e in employees:
-            groups[(getattr(e, keyname) or "")].append(e.employee)
-        
-        for group_value in sorted(groups.keys(), key=lambda x: (str(x).lower())):
-            # إضافة صف المجموعة
-            group_row = {keyname: group_value}
-            rows.append(group_row)
-            
-            # إضافة صفوق الموظفين في هذه المجموعة
-            for emp_id in sorted(groups[group_value], key=lambda eid: emp_map[eid].employee_name or ""):
-                employee_row = create_employee_row(emp_id)
-                rows.append(employee_row)
-    else:
-        for emp_id in emp_list:
-            employee_row = create_employee_row(emp_id)
-            rows.append(employee_row)
+def iter_horizontal_rows(f, dfrom: date, dto: date):
+    """Same rows as get_horizontal_data for every page, computed EXPORT_PAGE_SIZE employees at a time."""
+    employees = get_report_employees(f, paginate=False)
+    for group_row, group_employees in iter_employee_groups(f, employees):
+        if group_row:
+            yield group_row
+        for start in range(0, len(group_employees), EXPORT_PAGE_SIZE):
+            page = group_employees[start : start + EXPORT_PAGE_SIZE]
+            records = get_day_records(page, dfrom, dto, classify_singles=False)
+            for emp_doc in page:
+                yield horizontal_row(emp_doc, records[emp_doc.employee])
 
-    return rows
 
+# ------------ Background Export ------------
 
-# ------------ Attendance & Holiday Helpers ------------
+@frappe.whitelist()
+def export_horizontal_sheet(filters, file_format: str = "CSV") -> str:
+    """Queue a streaming export of the horizontal sheet; the user is notified with a download link."""
+    frappe.only_for(("System Manager", "HR Manager", "HR User"))
+    if file_format not in EXPORT_FORMATS:
+        frappe.throw(_("Unsupported export format: {0}").format(file_format))
 
-def build_attendance_code_map(emp_list, year, month):
-    """(employee, date) -> code (P/A/HD/A/HD/P/WFH/L)."""
-    Attendance = frappe.qb.DocType("Attendance")
-    status_expr = (
-        Case()
-        .when(((Attendance.status == "Half Day") & (Attendance.half_day_status == "Present")),
-              "Half Day/Other Half Present")
-        .when(((Attendance.status == "Half Day") & (Attendance.half_day_status == "Absent")),
-              "Half Day/Other Half Absent")
-        .else_(Attendance.status)
+    f = frappe._dict(frappe.parse_json(filters) if isinstance(filters, str) else filters or {})
+    normalize_filters(f)
+    frappe.enqueue(
+        "taj_core.peopleops.report.employee_first_last_checkins.employee_first_last_checkins._export_horizontal_sheet",
+        queue="long",
+        timeout=3600,
+        job_id="::".join([
+            "taj_checkins_export", frappe.session.user, export_period_label(f),
+            f.get("employee") or "", f.get("department") or "", f.get("group_by") or "", file_format,
+        ]),
+        deduplicate=True,
+        filters={k: v for k, v in f.items() if k not in ("after", "page_size")},
+        file_format=file_format,
     )
-    rows = (
-        frappe.qb.from_(Attendance)
-        .select(Attendance.employee, Attendance.attendance_date, status_expr.as_("norm_status"))
-        .where(
-            (Attendance.docstatus == 1)
-            & (Attendance.employee.isin(emp_list))
-            & (Extract("month", Attendance.attendance_date) == int(month))
-            & (Extract("year",  Attendance.attendance_date) == int(year))
-        )
-        .orderby(Attendance.employee, Attendance.attendance_date)
-    ).run(as_dict=True)
-
-    code_map = {}
-    for r in rows:
-        code = STATUS_CODE_MAP.get(r["norm_status"], None)
-        if code:
-            code_map[(r["employee"], getdate(r["attendance_date"]))] = code
-    return code_map
-
-
-def get_holiday_map_per_employee(employees, year: int, month: int):
-    """Return {(emp, date): 'WO' or 'H'}."""
-    companies = {e.company for e in employees if getattr(e, "company", None)}
-    default_lists = {}
-    if companies:
-        for comp in companies:
-            if not comp:
-                continue
-            try:
-                default_lists[comp] = frappe.get_cached_value("Company", comp, "default_holiday_list")
-            except Exception:
-                default_lists[comp] = None
-
-    needed_lists = set()
-    for e in employees:
-        needed_lists.add(e.holiday_list or default_lists.get(e.company))
-    needed_lists = {x for x in needed_lists if x}
-
-    Holiday = frappe.qb.DocType("Holiday")
-    holiday_rows_by_list = {}
-    for hl in needed_lists:
-        rows = (
-            frappe.qb.from_(Holiday)
-            .select(Holiday.holiday_date, Holiday.weekly_off)
-            .where(
-                (Holiday.parent == hl)
-                & (Extract("month", Holiday.holiday_date) == int(month))
-                & (Extract("year",  Holiday.holiday_date) == int(year))
-            )
-        ).run(as_dict=True)
-        holiday_rows_by_list[hl] = rows
-
-    result = {}
-    for e in employees:
-        hl = e.holiday_list or default_lists.get(e.company)
-        if not hl:
-            continue
-        rows = holiday_rows_by_list.get(hl) or []
-        for r in rows:
-            d = getdate(r["holiday_date"])
-            code = "WO" if cint(r.get("weekly_off")) else "H"
-            result[(e.employee, d)] = code
-    return result
-
-
-def get_leave_map_per_employee(emp_list, year: int, month: int):
-    """Return {(emp, date): 'L'} for leave days."""
-    LeaveApplication = frappe.qb.DocType("Leave Application")
-    
-    rows = (
-        frappe.qb.from_(LeaveApplication)
-        .select(LeaveApplication.employee, LeaveApplication.from_date, LeaveApplication.to_date)
-        .where(
-            (LeaveApplication.docstatus == 1)
-            & (LeaveApplication.employee.isin(emp_list))
-            & (LeaveApplication.status == "Approved")
-            & (
-                (Extract("month", LeaveApplication.from_date) == int(month)) |
-                (Extract("month", LeaveApplication.to_date) == int(month))
-            )
-            & (
-                (Extract("year", LeaveApplication.from_date) == int(year)) |
-                (Extract("year", LeaveApplication.to_date) == int(year))
-            )
-        )
-    ).run(as_dict=True)
+    return "queued"
 
-    leave_map = {}
-    for r in rows:
-        from_date = getdate(r["from_date"])
-        to_date = getdate(r["to_date"])
-        
-        current_date = from_date
-        while current_date <= to_date:
-            if current_date.month == month and current_date.year == year:
-                leave_map[(r["employee"], current_date)] = "L"
-            current_date += timedelta(days=1)
-            
-    return leave_map
+def _export_horizontal_sheet(filters, file_format: str = "CSV") -> str:
+    f = frappe._dict(filters)
+    f.show_horizontal = 1
+    normalize_filters(f)
+
+    columns = get_horizontal_columns(f)
+    fieldnames = [c["fieldname"] for c in columns]
+    header = [c["label"] for c in columns]
+
+    start_date, end_date, _mode = effective_range(f)
+    rows = iter_horizontal_rows(f, start_date, end_date) if start_date else iter(())
+    cells = ([row.get(fn) for fn in fieldnames] for row in rows)
+
+    file_name = f"employee_checkins_{export_period_label(f)}_{frappe.generate_hash(length=6)}.{EXPORT_FORMATS[file_format]}"
+    path = frappe.get_site_path("private", "files", file_name)
+    if file_format == "Excel":
+        _write_xlsx(path, header, cells)
+    else:
+        _write_csv(path, header, cells)
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+    }).insert(ignore_permissions=True)
+
+    user = frappe.session.user
+    enqueue_create_notification(user, {
+        "type": "Alert",
+        "document_type": "File",
+        "document_name": file_doc.name,
+        "subject": _("Employee checkins sheet {0} is ready to download").format(export_period_label(f)),
+        "from_user": user,
+    })
+    frappe.publish_realtime("taj_checkins_export_ready", {"file_url": file_doc.file_url}, user=user, after_commit=True)
+    return file_doc.file_url
+
+def export_period_label(f) -> str:
+    if is_range_mode(f):
+        return f"{f.from_date}_{f.to_date}"
+    return f"{f.year:04d}-{f.month:02d}"
+
+def _write_csv(path, header, cells):
+    # utf-8-sig ليفتح Excel الأسماء العربية بشكل صحيح
+    with open(path, "w", newline="", encoding="utf-8-sig") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(header)
+        writer.writerows(cells)
+
+def _write_xlsx(path, header, cells):
+    from openpyxl import Workbook
+
+    # write_only: الصفوف تُكتب إلى الملف مباشرة دون الاحتفاظ بها في الذاكرة
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Checkins")
+    ws.append(header)
+    for row in cells:
+        ws.append(row)
+    wb.save(path)
 
 
 # ------------ Legend ------------
@@ -677,15 +453,8 @@ def legend_message() -> str:
 
 @frappe.whitelist()
 def get_years_for_checkins() -> str:
-    res = frappe.db.sql(
-        """
-        SELECT DISTINCT YEAR(`time`) AS y
-        FROM `tabEmployee Checkin`
-        WHERE `time` IS NOT NULL
-        ORDER BY y DESC
-        """,
-        as_dict=True,
-    )
-    if not res:
-        return str(now_datetime().year)
-    return "\n".join(str(r.y) for r in res)
\ No newline at end of file
+    """Newest-first years for the Year filter, from the cached checkin year range."""
+    current = now_datetime().year
+    year_range = get_checkin_year_range()
+    first, last = year_range if year_range else (current, current)
+    return "\n".join(str(y) for y in range(max(last, current), first - 1, -1))
@@ -0,0 +1,42 @@
+// اعتماد جماعي مع فحص تأهيل المورد دفعة واحدة (Purchase Order / Purchase Receipt)
+['Purchase Order', 'Purchase Receipt'].forEach(doctype => {
+  const settings = frappe.listview_settings[doctype] = frappe.listview_settings[doctype] || {};
+  const base_onload = settings.onload;
+
+  settings.onload = function(listview) {
+    if (base_onload) base_onload(listview);
+    if (listview.doctype !== doctype) return;
+
+    listview.page.add_actions_menu_item(__('Submit (Qualification Check)'), () => {
+      const names = listview.get_checked_items(true);
+      if (!names.length) {
+        frappe.msgprint(__('Please select documents to submit.'));
+        return;
+      }
+
+      frappe.call({
+        method: 'taj_core.qc.doctype.supplier_qualification.supplier_qualification.bulk_submit_purchase_documents',
+        args: { doctype, names },
+        freeze: true,
+        freeze_message: __('Submitting {0} documents...', [names.length]),
+        callback: function(r) {
+          if (r.exc || !r.message) return;
+          const submitted = r.message.submitted || [];
+          const failed = r.message.failed || {};
+
+          let html = `<div><b>${__('Submitted')}:</b> ${submitted.length}</div>`;
+          Object.keys(failed).forEach(name => {
+            html += `<div><b>${frappe.utils.escape_html(name)}:</b> ${frappe.utils.escape_html(failed[name])}</div>`;
+          });
+
+          frappe.msgprint({
+            title: __('Bulk Submit'),
+            message: html,
+            indicator: Object.keys(failed).length ? 'orange' : 'green'
+          });
+          listview.refresh();
+        }
+      });
+    });
+  };
+});
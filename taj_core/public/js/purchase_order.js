@@ -1,5 +1,64 @@
+// كاش حالات الأصناف لكل مورد: { supplier: { version, statuses: { item_code: status } } }
+const taj_item_status_cache = {};
+
+function taj_sync_item_statuses(frm, retried) {
+  const supplier = frm.doc.supplier;
+  if (!supplier || frm.doc.docstatus !== 0) return;
+
+  const codes = [...new Set((frm.doc.items || []).map(row => row.item_code).filter(Boolean))];
+  if (!codes.length) return;
+
+  const entry = taj_item_status_cache[supplier];
+  const missing = entry ? codes.filter(code => !(code in entry.statuses)) : codes;
+
+  frappe.call({
+    method: 'taj_core.qc.doctype.supplier_qualification.supplier_qualification.get_supplier_items_status',
+    args: { supplier, item_codes: missing, version: entry ? entry.version : null },
+    callback: function(r) {
+      const msg = r.message;
+      if (r.exc || !msg) return;
+
+      if (msg.stale) {
+        // تغيرت المؤهلية: امسح الكاش واطلب كل الأصناف مرة واحدة
+        delete taj_item_status_cache[supplier];
+        if (!retried) taj_sync_item_statuses(frm, true);
+        return;
+      }
+
+      const cache = taj_item_status_cache[supplier] = taj_item_status_cache[supplier] || { version: msg.version, statuses: {} };
+      cache.version = msg.version;
+      Object.assign(cache.statuses, msg.statuses || {});
+      taj_apply_item_statuses(frm, cache.statuses);
+    }
+  });
+}
+
+function taj_apply_item_statuses(frm, statuses) {
+  let changed = false;
+  (frm.doc.items || []).forEach(row => {
+    const s = row.item_code && statuses[row.item_code];
+    if (s && row.item_status !== s) {
+      row.item_status = s; // عرض فقط - الحفظ يعيد الحساب في before_save
+      changed = true;
+    }
+  });
+  if (changed) frm.refresh_field('items');
+}
+
+frappe.ui.form.on('Purchase Order Item', {
+  item_code(frm) {
+    taj_sync_item_statuses(frm);
+  }
+});
+
 frappe.ui.form.on('Purchase Order', {
+  supplier(frm) {
+    taj_sync_item_statuses(frm);
+  },
+
   refresh(frm) {
+    taj_sync_item_statuses(frm);
+
     if (!frm.doc || frm.is_new() || !frm.doc.supplier) return;
     if (!Array.isArray(frm.doc.items) || frm.doc.items.length === 0) return;
 
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 # File: taj_core/qc/doctype/supplier_qualification/supplier_qualification.py
 from __future__ import annotations
+import hashlib
 import json
 import frappe
 from frappe import _
 from frappe.model.document import Document
-from frappe.utils import today, add_days, nowdate
+from frappe.utils import today, add_days, nowdate, getdate
+
+from taj_core.utils.role_directory import get_next_assignee
 
 
 class SupplierQualification(Document):
@@ -69,41 +72,148 @@ def get_partial_approved_items_set(qualification: str | None, doc_items: list |
     return {r["item"] for r in rows if r.get("item")}
 
 
-def validate_items_against_qualification(doc, method=None) -> None:
+# ----------------------------
+# Per-supplier qualification snapshot (Redis)
+# ----------------------------
+
+SNAPSHOT_CACHE_KEY = "taj_supplier_qualification_snapshot"
+# حد أقصى لعمر الـ hash كاملاً - شبكة أمان إن فات مسحٌ ما
+SNAPSHOT_CACHE_TTL = 3600
+
+
+def get_qualification_snapshot(supplier: str | None) -> dict | None:
     """
-    منع الاعتماد حتى موافقة المورد - برسائل مختصرة
+    Return the compiled qualification state of a supplier, cached in Redis.
+    Keys: supplier_group, qualification, status, valid_from, valid_to, approved, rejected.
     """
-    supplier = getattr(doc, "supplier", None)
     if not supplier:
-        return
+        return None
+    snapshot = frappe.cache().hget(SNAPSHOT_CACHE_KEY, supplier)
+    if snapshot is None:
+        snapshot = _build_qualification_snapshot(supplier)
+        _store_snapshot(supplier, snapshot)
+    return snapshot
+
+
+def get_qualification_snapshots(suppliers) -> dict[str, dict]:
+    """Batch version of get_qualification_snapshot: cache hits first, misses built together."""
+    cache = frappe.cache()
+    out, missing = {}, []
+    for supplier in {s for s in suppliers if s}:
+        snapshot = cache.hget(SNAPSHOT_CACHE_KEY, supplier)
+        if snapshot is None:
+            missing.append(supplier)
+        else:
+            out[supplier] = snapshot
 
-    # تخطَّ الموردين غير الخاضعين للتأهيل
-    from taj_core.integrations.supplier_hooks import is_qualified_supplier_group
-    supplier_group = frappe.db.get_value("Supplier", supplier, "supplier_group")
-    if not is_qualified_supplier_group(supplier_group):
-        return
+    for supplier, snapshot in _build_qualification_snapshots(missing).items():
+        _store_snapshot(supplier, snapshot)
+        out[supplier] = snapshot
+    return out
 
-    qual = get_active_qualification(supplier)
-    
-    # إذا لم توجد مؤهلية نشطة، أنشئ واحدة وامنع الاعتماد
-    if not qual:
-        create_auto_qualification(supplier)
-        frappe.throw(
-            _("❌ Supplier requires qualification. Request sent to quality team.")
-        )
 
-    # التحقق من حالة المؤهلية
-    status = (frappe.db.get_value("Supplier Qualification", qual, "approval_status") or "").strip()
+def _store_snapshot(supplier: str, snapshot: dict):
+    cache = frappe.cache()
+    cache.hset(SNAPSHOT_CACHE_KEY, supplier, snapshot)
+    key = cache.make_key(SNAPSHOT_CACHE_KEY)
+    # TTL يُضبط مرة واحدة فقط، فلا تمدده الكتابات المتتالية
+    if cache.ttl(key) < 0:
+        cache.expire(key, SNAPSHOT_CACHE_TTL)
+
+
+def _build_qualification_snapshot(supplier: str) -> dict:
+    return _build_qualification_snapshots([supplier])[supplier]
 
-    # السماح فقط بـ Approved أو Partially Approved
-    if status not in ["Approved", "Partially Approved"]:
-        frappe.throw(
-            _("❌ Supplier status: {}. Must be Approved or Partially Approved.").format(status)
-        )
 
-    # إذا كانت Partially Approved، تحقق من الأصناف
-    if status == "Partially Approved":
-        validate_partial_approval_items(doc, qual)
+def _build_qualification_snapshots(suppliers: list[str]) -> dict[str, dict]:
+    """Read supplier groups, latest qualifications and their item rows in three set-based queries."""
+    if not suppliers:
+        return {}
+
+    groups = dict(frappe.get_all(
+        "Supplier",
+        filters={"name": ["in", suppliers]},
+        fields=["name", "supplier_group"],
+        as_list=True,
+    ))
+    snapshots = {
+        supplier: {
+            "supplier_group": groups.get(supplier),
+            "qualification": None,
+            "status": "",
+            "valid_from": None,
+            "valid_to": None,
+            "modified": None,
+            "approved": frozenset(),
+            "rejected": frozenset(),
+        }
+        for supplier in suppliers
+    }
+
+    # آخر مؤهلية بجميع حالاتها لكل مورد
+    by_qualification = {}
+    for qual in frappe.get_all(
+        "Supplier Qualification",
+        filters={"supplier": ["in", suppliers]},
+        fields=["name", "supplier", "approval_status", "valid_from", "valid_to", "modified"],
+        order_by="creation DESC",
+    ):
+        snapshot = snapshots[qual["supplier"]]
+        if snapshot["qualification"]:
+            continue
+        snapshot.update({
+            "qualification": qual["name"],
+            "status": (qual["approval_status"] or "").strip(),
+            "valid_from": getdate(qual["valid_from"]) if qual["valid_from"] else None,
+            "valid_to": getdate(qual["valid_to"]) if qual["valid_to"] else None,
+            "modified": str(qual["modified"]),
+        })
+        by_qualification[qual["name"]] = snapshot
+
+    if not by_qualification:
+        return snapshots
+
+    approved, rejected = {}, {}
+    for r in frappe.get_all(
+        "Supplier Approved Item",
+        filters={
+            "parent": ["in", list(by_qualification)],
+            "parenttype": "Supplier Qualification",
+            "item_status": ["in", ["Approved", "Rejected"]],
+        },
+        fields=["parent", "item", "item_status"],
+    ):
+        target = approved if r["item_status"] == "Approved" else rejected
+        target.setdefault(r["parent"], set()).add(r["item"])
+
+    for qual_name, snapshot in by_qualification.items():
+        snapshot["approved"] = frozenset(approved.get(qual_name, ()))
+        snapshot["rejected"] = frozenset(rejected.get(qual_name, ()))
+    return snapshots
+
+
+def clear_qualification_snapshot(doc=None, method=None, supplier: str | None = None):
+    """Drop the cached snapshot (doc_events on Supplier / Supplier Qualification), now and after commit."""
+    suppliers = {supplier} if supplier else set()
+    if not supplier and doc is not None:
+        suppliers.add(doc.name if doc.doctype == "Supplier" else getattr(doc, "supplier", None))
+        # تغيير المورد في المؤهلية يلزم مسح القديم أيضاً
+        previous = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+        if previous and previous.get("supplier"):
+            suppliers.add(previous.get("supplier"))
+    suppliers.discard(None)
+    if not suppliers:
+        return
+
+    def clear():
+        cache = frappe.cache()
+        for name in suppliers:
+            cache.hdel(SNAPSHOT_CACHE_KEY, name)
+
+    clear()
+    # submit متزامن قد يعيد بناء الـ snapshot من الصف القديم قبل الـ commit
+    frappe.db.after_commit.add(clear)
+
 
 def validate_items_against_qualification(doc, method=None) -> None:
     """
@@ -113,48 +223,52 @@ def validate_items_against_qualification(doc, method=None) -> None:
     if not supplier:
         return
 
-    from taj_core.integrations.supplier_hooks import is_qualified_supplier_group
-    supplier_group = frappe.db.get_value("Supplier", supplier, "supplier_group")
-    if not is_qualified_supplier_group(supplier_group):
+    # تم التحقق مسبقاً عبر validate_purchase_documents (الاعتماد الجماعي)
+    if doc.flags.get("taj_qualification_verified"):
         return
 
-    # البحث عن آخر مؤهلية بجميع حالاتها
-    last_qual = frappe.get_all(
-        "Supplier Qualification",
-        filters={"supplier": supplier},
-        fields=["name", "approval_status", "valid_to"],
-        order_by="creation DESC",
-        limit=1
-    )
-    
-    if not last_qual:
+    snapshot = get_qualification_snapshot(supplier)
+    codes = [d.item_code for d in (getattr(doc, "items", []) or []) if getattr(d, "item_code", None)]
+    message = get_qualification_verdict(snapshot, codes)
+    if message is None:
+        return
+
+    if not snapshot["qualification"]:
         # لا توجد أي مؤهلية
         create_auto_qualification(supplier)
-        frappe.throw(_("❌ Qualification required - request sent to quality"))
-        return
+    frappe.throw(message)
+
+
+def get_qualification_verdict(snapshot: dict, item_codes: list[str]) -> str | None:
+    """Return the blocking message for a purchase document, or None when it may be submitted."""
+    from taj_core.integrations.supplier_hooks import is_qualified_supplier_group
+    if not is_qualified_supplier_group(snapshot["supplier_group"]):
+        return None
+
+    if not snapshot["qualification"]:
+        return _("❌ Qualification required - request sent to quality")
+
+    status = snapshot["status"]
 
-    status = (last_qual[0]["approval_status"] or "").strip()
-    
     # التحقق إذا كانت المؤهلية منتهية الصلاحية
-    is_expired = False
-    if last_qual[0]["valid_to"]:
-        from frappe.utils import today
-        if last_qual[0]["valid_to"] < today():
-            is_expired = True
+    is_expired = bool(snapshot["valid_to"] and snapshot["valid_to"] < getdate(today()))
 
     # إظهار الرسالة المناسبة
     if status == "Rejected":
-        frappe.throw(_("❌ Supplier rejected by quality team"))
+        return _("❌ Supplier rejected by quality team")
     elif status == "Request Approval":
-        frappe.throw(_("❌ Awaiting quality team approval")) 
+        return _("❌ Awaiting quality team approval")
     elif status == "Partially Approved" and not is_expired:
-        validate_partial_approval_items(doc, last_qual[0]["name"])
+        status_map = {c: "Approved" for c in item_codes if c in snapshot["approved"]}
+        status_map.update({c: "Rejected" for c in item_codes if c in snapshot["rejected"]})
+        return _partial_approval_message(item_codes, status_map)
     elif status == "Approved" and not is_expired:
-        return  # السماح بالاعتماد
+        return None  # السماح بالاعتماد
     else:
         # حالات أخرى أو منتهية الصلاحية
-        frappe.throw(_("❌ Supplier qualification issue - contact quality team"))
-      
+        return _("❌ Supplier qualification issue - contact quality team")
+
+
 def validate_partial_approval_items(doc, qualification: str):
     """التحقق من الأصناف مع أولوية Pending approval"""
     doc_items = getattr(doc, "items", []) or []
@@ -163,15 +277,16 @@ def validate_partial_approval_items(doc, qualification: str):
         return
 
     status_map = _get_items_status_map_for_qualification(qualification, codes)
+    message = _partial_approval_message(codes, status_map)
+    if message:
+        frappe.throw(message)
 
+
+def _partial_approval_message(codes: list[str], status_map: dict[str, str]) -> str | None:
     rejected = []
     pending = []
     
-    for d in doc_items:
-        code = getattr(d, "item_code", None)
-        if not code:
-            continue
-            
+    for code in codes:
         st = (status_map.get(code) or "").strip()
         if st == "Approved":
             continue
@@ -183,16 +298,112 @@ def validate_partial_approval_items(doc, qualification: str):
     # إعطاء الأولوية: Pending approval أولاً
     if pending:
         if len(pending) > 3:
-            frappe.throw(_("❌ {} items need approval (first 3: {})").format(len(pending), ", ".join(pending[:3])))
-        else:
-            frappe.throw(_("❌ Pending approval: {}").format(", ".join(pending)))
+            return _("❌ {} items need approval (first 3: {})").format(len(pending), ", ".join(pending[:3]))
+        return _("❌ Pending approval: {}").format(", ".join(pending))
     
     # إذا لا توجد pending، عرض rejected
-    elif rejected:
+    if rejected:
         if len(rejected) > 3:
-            frappe.throw(_("❌ {} items rejected (first 3: {})").format(len(rejected), ", ".join(rejected[:3])))
-        else:
-            frappe.throw(_("❌ Rejected items: {}").format(", ".join(rejected)))
+            return _("❌ {} items rejected (first 3: {})").format(len(rejected), ", ".join(rejected[:3]))
+        return _("❌ Rejected items: {}").format(", ".join(rejected))
+    return None
+
+
+# ----------------------------
+# Batch validation / bulk submit
+# ----------------------------
+
+QUALIFIED_PURCHASE_DOCTYPES = {
+    "Purchase Order": "Purchase Order Item",
+    "Purchase Receipt": "Purchase Receipt Item",
+    "Purchase Invoice": "Purchase Invoice Item",
+    "Supplier Quotation": "Supplier Quotation Item",
+}
+
+
+@frappe.whitelist()
+def validate_purchase_documents(doctype: str, names: list[str] | str) -> dict[str, str | None]:
+    """
+    Validate N purchase documents against supplier qualification in a constant number of queries.
+    Returns {docname: blocking message or None}. Read-only: no qualification is requested here.
+    """
+    verdicts, _suppliers, _snapshots = _get_purchase_verdicts(doctype, names)
+    return verdicts
+
+
+def _get_purchase_verdicts(doctype: str, names) -> tuple[dict, dict, dict]:
+    """(verdicts, {docname: supplier}, {supplier: snapshot}) for documents the user can read."""
+    if doctype not in QUALIFIED_PURCHASE_DOCTYPES:
+        frappe.throw(_("Qualification check is not supported for {0}").format(doctype))
+    if isinstance(names, str):
+        names = frappe.parse_json(names)
+    names = list(dict.fromkeys(n for n in (names or []) if n))
+    if not names:
+        return {}, {}, {}
+
+    # get_list يطبق صلاحيات القراءة وصلاحيات المستخدم في استعلام واحد
+    suppliers = dict(frappe.get_list(
+        doctype, filters={"name": ["in", names]}, fields=["name", "supplier"], as_list=True
+    ))
+    denied = [n for n in names if n not in suppliers]
+    if denied:
+        frappe.throw(
+            _("Not permitted to read {0}: {1}").format(_(doctype), ", ".join(denied)),
+            frappe.PermissionError,
+        )
+
+    codes_by_doc = {}
+    for parent, item_code in frappe.get_all(
+        QUALIFIED_PURCHASE_DOCTYPES[doctype],
+        filters={"parent": ["in", names], "parenttype": doctype},
+        fields=["parent", "item_code"],
+        order_by="idx asc",
+        as_list=True,
+    ):
+        if item_code:
+            codes_by_doc.setdefault(parent, []).append(item_code)
+
+    snapshots = get_qualification_snapshots(suppliers.values())
+
+    verdicts = {}
+    for name in names:
+        supplier = suppliers.get(name)
+        if not supplier:
+            verdicts[name] = None
+            continue
+        verdicts[name] = get_qualification_verdict(snapshots[supplier], codes_by_doc.get(name, []))
+    return verdicts, suppliers, snapshots
+
+
+@frappe.whitelist()
+def bulk_submit_purchase_documents(doctype: str, names: list[str] | str) -> dict:
+    """Submit many purchase documents, checking qualification once for the whole batch."""
+    verdicts, suppliers, snapshots = _get_purchase_verdicts(doctype, names)
+
+    submitted, failed, requested = [], {}, set()
+    for name, message in verdicts.items():
+        if message:
+            failed[name] = message
+            supplier = suppliers.get(name)
+            if supplier and not snapshots[supplier]["qualification"] and supplier not in requested:
+                # طلب مؤهلية واحد لكل مورد
+                create_auto_qualification(supplier)
+                requested.add(supplier)
+            continue
+        try:
+            doc = frappe.get_doc(doctype, name)
+            doc.check_permission("submit")
+            doc.flags.taj_qualification_verified = True
+            doc.submit()
+            frappe.db.commit()
+            submitted.append(name)
+        except Exception as e:
+            frappe.db.rollback()
+            failed[name] = str(e)
+            frappe.clear_messages()
+
+    return {"submitted": submitted, "failed": failed}
+
 
 def create_auto_qualification(supplier: str):
     """إنشاء مؤهلية تلقائية بدون رسائل للمستخدم"""
@@ -260,56 +471,96 @@ def get_supplier_item_status(supplier: str, item_code: str) -> str:
     return item_status or default_status
 
 
-@frappe.whitelist()
-def get_supplier_items_status_map(supplier: str, item_codes: list[str] | None = None) -> dict:
+def _is_snapshot_active(snapshot: dict) -> bool:
+    """Same rules as get_active_qualification, evaluated on the cached snapshot."""
+    if snapshot["status"] not in ("Approved", "Partially Approved"):
+        return False
+    current = getdate(today())
+    if snapshot["valid_from"] and snapshot["valid_from"] > current:
+        return False
+    if snapshot["valid_to"] and snapshot["valid_to"] < current:
+        return False
+    return True
+
+
+def get_snapshot_version(snapshot: dict) -> str:
     """
-    Batch version: return {item_code: status} for given list of codes.
-    Rules:
-      - If qualification.status == "Approved" -> every code => "Approved"
-      - Else -> read rows (Approved/Rejected), anything missing => "Request Approval"
+    Version token for a supplier's item statuses:
+    qualification + modified + hash of the approved/rejected rows + active flag.
     """
-    # may arrive from frappe.call as JSON string
+    if not snapshot or not snapshot["qualification"]:
+        return "none"
+    rows = "|".join(sorted(snapshot["approved"])) + "#" + "|".join(sorted(snapshot["rejected"]))
+    return "{0}:{1}:{2}:{3}".format(
+        snapshot["qualification"],
+        snapshot.get("modified") or "",
+        hashlib.md5(rows.encode()).hexdigest()[:12],
+        int(_is_snapshot_active(snapshot)),
+    )
+
+
+def _snapshot_items_status_map(snapshot: dict, codes: list[str]) -> dict[str, str]:
+    if not snapshot or not snapshot["qualification"] or not _is_snapshot_active(snapshot):
+        return {c: "Request Approval" for c in codes}
+    if snapshot["status"] == "Approved":
+        return {c: "Approved" for c in codes}
+
+    out = {}
+    for code in codes:
+        if code in snapshot["approved"]:
+            out[code] = "Approved"
+        elif code in snapshot["rejected"]:
+            out[code] = "Rejected"
+        else:
+            out[code] = "Request Approval"
+    return out
+
+
+def _parse_item_codes(item_codes) -> list[str]:
+    """Decode (frappe.call sends JSON strings) and dedupe while preserving order."""
     if isinstance(item_codes, str):
         try:
             item_codes = json.loads(item_codes or "[]")
         except json.JSONDecodeError:
             item_codes = []
+    return list(dict.fromkeys(c for c in (item_codes or []) if c))
 
-    out: dict[str, str] = {}
-    if not supplier or not item_codes:
-        return out
 
-    # dedupe while preserving order
-    seen = set()
-    dedup_codes = []
-    for c in item_codes:
-        if c and c not in seen:
-            seen.add(c)
-            dedup_codes.append(c)
+@frappe.whitelist()
+def get_supplier_items_status_map(supplier: str, item_codes: list[str] | None = None) -> dict:
+    """
+    Batch version: return {item_code: status} for given list of codes.
+    Rules:
+      - If qualification.status == "Approved" -> every code => "Approved"
+      - Else -> read rows (Approved/Rejected), anything missing => "Request Approval"
+    """
+    dedup_codes = _parse_item_codes(item_codes)
+    if not supplier or not dedup_codes:
+        return {}
 
-    qual = get_active_qualification(supplier)
-    if not qual:
-        return {c: "Request Approval" for c in dedup_codes}
+    return _snapshot_items_status_map(get_qualification_snapshot(supplier), dedup_codes)
 
-    qual_status = frappe.db.get_value("Supplier Qualification", qual, "approval_status") or ""
-    if qual_status == "Approved":
-        return {c: "Approved" for c in dedup_codes}
 
-    rows = frappe.get_all(
-        "Supplier Approved Item",
-        filters={
-            "parent": qual,
-            "parenttype": "Supplier Qualification",
-            "item": ["in", dedup_codes],
-        },
-        fields=["item", "item_status"],
-        limit=len(dedup_codes),
-    )
+@frappe.whitelist()
+def get_supplier_items_status(supplier: str, item_codes: list[str] | None = None, version: str | None = None) -> dict:
+    """
+    Versioned status lookup for the Purchase Order form.
+    Returns {"version", "statuses"}; {"version", "not_modified": 1} when the client's
+    version is current and it asks for no new codes; {"version", "stale": 1} when the
+    client's version is outdated (it should drop its cache and ask again).
+    """
+    if not supplier:
+        return {"version": "none", "statuses": {}}
 
-    found = {r["item"]: (r["item_status"] or "Request Approval") for r in rows}
-    for code in dedup_codes:
-        out[code] = found.get(code, "Request Approval")
-    return out
+    snapshot = get_qualification_snapshot(supplier)
+    current = get_snapshot_version(snapshot)
+    codes = _parse_item_codes(item_codes)
+
+    if version and version != current:
+        return {"version": current, "stale": 1}
+    if version and not codes:
+        return {"version": current, "not_modified": 1}
+    return {"version": current, "statuses": _snapshot_items_status_map(snapshot, codes)}
 
 
 @frappe.whitelist()
@@ -354,7 +605,11 @@ def request_items_approval(
     if not clean_items:
         return {"message": "No valid items provided", "success": False}
 
+    # قفل الأب قبل قراءة الأصناف الموجودة: طلبان متزامنان لا يريان نفس الصنف كجديد
+    frappe.db.get_value("Supplier Qualification", qual_name, "name", for_update=True)
+
     # الحصول على الأصناف الموجودة مع حالتها
+    # (قراءة مقفلة: ترى آخر ما تم commit بعد انتظار القفل، لا لقطة بداية المعاملة)
     existing_items = frappe.get_all(
         "Supplier Approved Item",
         filters={
@@ -362,7 +617,8 @@ def request_items_approval(
             "item": ["in", clean_items]
         },
         fields=["item", "item_status"],
-        limit=len(clean_items)
+        limit=len(clean_items),
+        for_update=True,
     )
     
     # تصنيف الأصناف حسب حالتها
@@ -385,24 +641,15 @@ def request_items_approval(
         else:
             new_items.append(item_code)
 
-    # إضافة الأصناف الجديدة فقط
-    added = []
-    for item_code in new_items:
-        try:
-            doc = frappe.get_doc({
-                "doctype": "Supplier Approved Item",
-                "parent": qual_name,
-                "parenttype": "Supplier Qualification",
-                "parentfield": "sq_items",
-                "item": item_code,
-                "item_status": "Request Approval",
-                "remarks": note or "",
-            })
-            doc.insert(ignore_permissions=True)
-            added.append(item_code)
-        except Exception:
-            pass
+    # إضافة الأصناف الجديدة فقط - إدخال جماعي واحد بدلاً من insert لكل صنف
+    added, invalid_items = _bulk_add_approval_rows(qual_name, new_items, note)
 
+    if added:
+        from taj_core.qc.doctype.supplier_qualification_scorecard.supplier_qualification_scorecard import (
+            refresh_scorecards,
+        )
+        clear_qualification_snapshot(supplier=supplier)
+        refresh_scorecards([supplier])
     frappe.db.commit()
 
     # بناء رسالة واضحة
@@ -420,6 +667,9 @@ def request_items_approval(
     if rejected_items:
         message_parts.append(f"🔴 Already rejected: {len(rejected_items)} items")
 
+    if invalid_items:
+        message_parts.append(f"⚠️ Unknown items: {', '.join(invalid_items)}")
+
     message = " • ".join(message_parts) if message_parts else "No action needed"
 
     return {
@@ -428,42 +678,216 @@ def request_items_approval(
         "added": added,
         "pending": pending_items,
         "approved": approved_items,
-        "rejected": rejected_items
+        "rejected": rejected_items,
+        "invalid": invalid_items,
     }
 
 
-@frappe.whitelist()
-def update_certificate_statuses():
+def _bulk_add_approval_rows(qualification: str, item_codes: list[str], note: str | None = None) -> tuple[list[str], list[str]]:
+    """
+    Append 'Request Approval' rows to sq_items with one multi-row insert.
+    Returns (added, invalid) - invalid are codes that are not existing Items.
+    """
+    if not item_codes:
+        return [], []
+
+    item_names = dict(frappe.get_all(
+        "Item", filters={"name": ["in", item_codes]}, fields=["name", "item_name"], as_list=True
+    ))
+    added = [code for code in item_codes if code in item_names]
+    invalid = [code for code in item_codes if code not in item_names]
+    if not added:
+        return added, invalid
+
+    # الأب مقفول مسبقاً (for_update) من المستدعي قبل فحص الأصناف الموجودة؛ idx يُحسب مرة واحدة
+    start_idx = frappe.db.sql(
+        """
+        SELECT COALESCE(MAX(idx), 0) FROM `tabSupplier Approved Item`
+        WHERE parent = %s AND parenttype = 'Supplier Qualification' AND parentfield = 'sq_items'
+        """,
+        qualification,
+    )[0][0]
+
+    now = frappe.utils.now()
+    user = frappe.session.user
+    frappe.db.bulk_insert(
+        "Supplier Approved Item",
+        fields=[
+            "name", "creation", "modified", "owner", "modified_by", "docstatus",
+            "parent", "parenttype", "parentfield", "idx",
+            "item", "item_name", "item_status", "remarks",
+        ],
+        values=[
+            (frappe.generate_hash(length=10), now, now, user, user, 0,
+             qualification, "Supplier Qualification", "sq_items", start_idx + i,
+             code, item_names[code], "Request Approval", note or "")
+            for i, code in enumerate(added, start=1)
+        ],
+    )
+    # تحديث modified للأب مرة واحدة (يغير رمز النسخة في الكاش)
+    frappe.db.set_value(
+        "Supplier Qualification", qualification,
+        {"modified": now, "modified_by": user}, update_modified=False,
+    )
+
+    from taj_core.qc.doctype.supplier_qualification_history.supplier_qualification_history import (
+        record_transitions,
+    )
+    supplier = frappe.db.get_value("Supplier Qualification", qualification, "supplier")
+    record_transitions([
+        {"supplier": supplier, "item": code, "status": "Request Approval", "qualification": qualification, "effective_from": now}
+        for code in added
+    ])
+    return added, invalid
+
+
+# ----------------------------
+# Certificate expiry engine
+# ----------------------------
+
+CERTIFICATE_LAST_RUN_KEY = "taj_certificate_expiry_last_run"
+CERTIFICATE_WARNING_DAYS = 30
+CERTIFICATE_CHUNK_SIZE = 500
+
+
+def update_certificate_statuses() -> list[dict]:
     """
     Daily job: update status on Supplier Certificate rows based on expiry_date.
     Rules:
       - expiry_date < today           -> Expired
       - today <= expiry_date < +30d   -> About to Expire  (إن كانت حالتها Active)
       - otherwise leave as-is (Active / Pending / Renewal)
+
+    Incremental: only rows whose expiry_date crossed a threshold since the last run are
+    touched (rows edited in between are handled by set_certificate_statuses on save).
+    Works in bounded chunks; each chunk's feed is emitted right after it commits,
+    so a later failure cannot lose transitions that are already saved. Returns the feed.
     """
+    feed = []
     try:
-        # Expired
-        frappe.db.sql("""
-            UPDATE `tabSupplier Certificate`
-               SET certificate_status = 'Expired'
-             WHERE COALESCE(expiry_date, '1900-01-01') < %(today)s
-               AND certificate_status <> 'Expired'
-        """, {"today": today()})
+        current = today()
+        last_run = frappe.db.get_global(CERTIFICATE_LAST_RUN_KEY)
+        if last_run and getdate(last_run) > getdate(current):
+            last_run = None
+
+        # Expired - أول تشغيل يشمل تواريخ الانتهاء الفارغة كما في السابق
+        if last_run:
+            where = "c.expiry_date >= %(from)s AND c.expiry_date < %(today)s"
+        else:
+            where = "(c.expiry_date IS NULL OR c.expiry_date < %(today)s)"
+        feed += _apply_certificate_transition(
+            where + " AND c.certificate_status <> 'Expired'",
+            {"from": last_run, "today": current},
+            "Expired",
+        )
 
         # About to Expire (within next 30 days) — فقط لمن حالته Active الآن
-        frappe.db.sql("""
-            UPDATE `tabSupplier Certificate`
-               SET certificate_status = 'About to Expire'
-             WHERE COALESCE(expiry_date, '9999-12-31') >= %(today)s
-               AND expiry_date < %(limit)s
-               AND certificate_status = 'Active'
-        """, {"today": today(), "limit": add_days(today(), 30)})
+        feed += _apply_certificate_transition(
+            "c.expiry_date >= %(from)s AND c.expiry_date < %(limit)s AND c.certificate_status = 'Active'",
+            {
+                "from": add_days(last_run, CERTIFICATE_WARNING_DAYS) if last_run else current,
+                "limit": add_days(current, CERTIFICATE_WARNING_DAYS),
+            },
+            "About to Expire",
+        )
 
+        frappe.db.set_global(CERTIFICATE_LAST_RUN_KEY, current)
         frappe.db.commit()
 
     except Exception:
         frappe.log_error(frappe.get_traceback(), "update_certificate_statuses error")
+    return feed
+
+
+def _apply_certificate_transition(where: str, params: dict, new_status: str) -> list[dict]:
+    """Select matching rows in chunks, update them by name, commit and emit per chunk."""
+    feed = []
+    while True:
+        rows = frappe.db.sql(
+            f"""
+            SELECT c.name AS certificate, c.parent AS qualification, q.supplier,
+                   c.certificate_type, c.expiry_date, c.certificate_status AS old_status
+            FROM `tabSupplier Certificate` c
+            LEFT JOIN `tabSupplier Qualification` q ON q.name = c.parent
+            WHERE {where}
+            LIMIT {CERTIFICATE_CHUNK_SIZE}
+            """,
+            params,
+            as_dict=True,
+        )
+        if not rows:
+            break
+
+        frappe.db.sql(
+            """
+            UPDATE `tabSupplier Certificate`
+               SET certificate_status = %(status)s
+             WHERE name IN %(names)s
+            """,
+            {"status": new_status, "names": tuple(r.certificate for r in rows)},
+        )
+        frappe.db.commit()
+
+        for r in rows:
+            r.new_status = new_status
+        feed.extend(rows)
+        on_certificate_status_change(rows)
+
+        if len(rows) < CERTIFICATE_CHUNK_SIZE:
+            break
+    return feed
+
 
+def set_certificate_statuses(doc, method=None):
+    """before_save: apply the daily expiry rules to edited certificate rows immediately."""
+    current = getdate(today())
+    limit = getdate(add_days(current, CERTIFICATE_WARNING_DAYS))
+    for row in doc.get("sq_certificate") or []:
+        expiry = getdate(row.expiry_date) if row.expiry_date else None
+        if not row.certificate_status:
+            continue
+        if (expiry is None or expiry < current) and row.certificate_status != "Expired":
+            row.certificate_status = "Expired"
+        elif expiry and current <= expiry < limit and row.certificate_status == "Active":
+            row.certificate_status = "About to Expire"
+
+
+def on_certificate_status_change(feed: list[dict]):
+    """Consume the change feed: re-evaluate affected suppliers and notify the quality role."""
+    suppliers = sorted({r.supplier for r in feed if r.get("supplier")})
+    for supplier in suppliers:
+        clear_qualification_snapshot(supplier=supplier)
+
+    from taj_core.qc.doctype.supplier_qualification_scorecard.supplier_qualification_scorecard import (
+        refresh_scorecards,
+    )
+    refresh_scorecards(suppliers)
+    frappe.db.commit()
+
+    try:
+        from taj_core.utils.role_directory import get_role_emails
+        settings = frappe.get_cached_doc("Supplier Qualification Settings")
+        emails = get_role_emails(getattr(settings, "default_todo_role", "Quality Manager"))
+        if not emails:
+            return
+
+        lines = "".join(
+            "<li>{0} - {1} ({2}): {3} → {4}</li>".format(
+                frappe.utils.escape_html(r.supplier or r.qualification),
+                frappe.utils.escape_html(r.certificate_type or ""),
+                r.expiry_date or "-",
+                r.old_status or "-",
+                r.new_status,
+            )
+            for r in feed
+        )
+        frappe.sendmail(
+            recipients=emails,
+            subject=_("Supplier Certificates | {0} status changes").format(len(feed)),
+            message="<ul>{0}</ul>".format(lines),
+        )
+    except Exception as e:
+        frappe.log_error(f"Certificate change notification failed: {str(e)}", "Supplier Certificate Notification Error")
 
 
 def _get_items_status_map_for_qualification(qualification: str, item_codes: list[str]) -> dict[str, str]:
@@ -523,22 +947,10 @@ def create_approval_todo(qualification_name: str, supplier: str):
     try:
         supplier_name = frappe.db.get_value("Supplier", supplier, "supplier_name")
         
-        # الحصول على الإعدادات
+        # توزيع دوري على مستخدمي الدور المحدد (من الإعدادات)
         settings = frappe.get_cached_doc("Supplier Qualification Settings")
         assigned_role = getattr(settings, "default_todo_role", "Quality Manager")
-        
-        # البحث عن مستخدمين بالدور المحدد
-        users_with_role = frappe.get_all(
-            "Has Role",
-            filters={"role": assigned_role, "parenttype": "User"},
-            fields=["parent"],
-            distinct=True
-        )
-        
-        if not users_with_role:
-            assigned_to = frappe.session.user
-        else:
-            assigned_to = users_with_role[0]["parent"]
+        assigned_to = get_next_assignee(assigned_role) or frappe.session.user
         
         # وصف المهمة
         description = _("🆕 New supplier requires qualification: {0} ({1})").format(
@@ -551,7 +963,7 @@ def create_approval_todo(qualification_name: str, supplier: str):
             "description": description,
             "reference_type": "Supplier Qualification",
             "reference_name": qualification_name,
-            "assigned_to": assigned_to,
+            "allocated_to": assigned_to,
             "priority": "High",
             "date": frappe.utils.nowdate(),
             "role": assigned_role
@@ -568,6 +980,7 @@ def create_approval_todo(qualification_name: str, supplier: str):
 def auto_set_item_status_for_po(doc, method=None):
     """
     تعيين تلقائي لحالة الأصناف في Purchase Order مع معالجة الأخطاء
+    يتخطى إعادة الحساب إذا لم يتغير (المورد، الأصناف، نسخة المؤهلية)
     """
     try:
         if not doc or doc.is_new() or not getattr(doc, "supplier", None):
@@ -589,15 +1002,118 @@ def auto_set_item_status_for_po(doc, method=None):
         if not item_codes:
             return
 
+        snapshot = get_qualification_snapshot(doc.supplier)
+        version = get_snapshot_version(snapshot)
+        if doc.get("taj_item_status_digest") == _item_status_digest(doc, version):
+            return
+
         # الحصول على حالات الأصناف
-        status_map = get_supplier_items_status_map(doc.supplier, item_codes)
+        status_map = _snapshot_items_status_map(snapshot, item_codes)
         
         # تعيين الحالة لكل صنف
         for item in doc.items:
             code = getattr(item, "item_code", None)
             if code and code in status_map:
                 item.item_status = status_map[code]
+
+        doc.taj_item_status_digest = _item_status_digest(doc, version)
                 
     except Exception as e:
         # تسجيل الخطأ بدون إيقاف العملية
-        frappe.log_error(f"Error in auto_set_item_status_for_po: {str(e)}")
\ No newline at end of file
+        frappe.log_error(f"Error in auto_set_item_status_for_po: {str(e)}")
+
+
+def _item_status_digest(doc, version: str) -> str:
+    """
+    Digest of (supplier, sorted (item_code, item_status) rows, qualification version).
+    Including each row's current status catches added, removed or swapped rows.
+    """
+    rows = sorted(
+        (d.item_code, d.get("item_status") or "") for d in doc.items if getattr(d, "item_code", None)
+    )
+    payload = json.dumps([doc.supplier, rows, version], separators=(",", ":"))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def enqueue_po_item_status_refresh(doc, method=None):
+    """Supplier Qualification on_update: refresh item_status on the supplier's open POs in the background."""
+    if not getattr(doc, "supplier", None):
+        return
+    frappe.enqueue(
+        "taj_core.qc.doctype.supplier_qualification.supplier_qualification.update_open_po_item_statuses",
+        queue="short",
+        job_id=f"taj_refresh_po_item_status::{doc.supplier}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        supplier=doc.supplier,
+    )
+
+
+@frappe.whitelist()
+def refresh_open_po_item_statuses(supplier: str | None = None) -> int | str:
+    """
+    Bulk-refresh item_status on open Purchase Orders. One supplier runs inline;
+    all suppliers is a managers-only background job (every open PO is rewritten).
+    """
+    frappe.has_permission("Purchase Order", "write", throw=True)
+    if supplier:
+        return update_open_po_item_statuses(supplier)
+
+    frappe.only_for(("System Manager", "Purchase Manager", "Quality Manager"))
+    frappe.enqueue(
+        "taj_core.qc.doctype.supplier_qualification.supplier_qualification.update_open_po_item_statuses",
+        queue="long",
+        job_id="taj_refresh_open_po_item_statuses::all",
+        deduplicate=True,
+    )
+    return "queued"
+
+
+def update_open_po_item_statuses(supplier: str | None = None) -> int:
+    """At most three UPDATEs per supplier. Returns the number of POs touched."""
+    if not frappe.db.has_column("Purchase Order Item", "item_status"):
+        return 0
+
+    filters = {"docstatus": ["<", 2], "status": ["not in", ["Completed", "Closed", "Cancelled"]]}
+    if supplier:
+        filters["supplier"] = supplier
+    open_pos = frappe.get_all("Purchase Order", filters=filters, fields=["name", "supplier"], as_list=True)
+    if not open_pos:
+        return 0
+
+    pos_by_supplier = {}
+    for name, po_supplier in open_pos:
+        if po_supplier:
+            pos_by_supplier.setdefault(po_supplier, []).append(name)
+
+    snapshots = get_qualification_snapshots(pos_by_supplier)
+    for po_supplier, po_names in pos_by_supplier.items():
+        codes = frappe.get_all(
+            "Purchase Order Item",
+            filters={"parent": ["in", po_names], "parenttype": "Purchase Order"},
+            pluck="item_code",
+            distinct=True,
+        )
+        by_status = {}
+        for code, status in _snapshot_items_status_map(snapshots[po_supplier], [c for c in codes if c]).items():
+            by_status.setdefault(status, []).append(code)
+
+        for status, status_codes in by_status.items():
+            frappe.db.sql(
+                """
+                UPDATE `tabPurchase Order Item`
+                   SET item_status = %(status)s
+                 WHERE parenttype = 'Purchase Order'
+                   AND parent IN %(parents)s
+                   AND item_code IN %(codes)s
+                """,
+                {"status": status, "parents": tuple(po_names), "codes": tuple(status_codes)},
+            )
+
+    if frappe.db.has_column("Purchase Order", "taj_item_status_digest"):
+        frappe.db.sql(
+            "UPDATE `tabPurchase Order` SET taj_item_status_digest = NULL WHERE name IN %(names)s",
+            {"names": tuple(name for name, _s in open_pos)},
+        )
+    frappe.db.commit()
+    return len(open_pos)
@@ -0,0 +1,188 @@
+# Copyright (c) 2026, Maged Bajandooh and contributors
+# For license information, please see license.txt
+
+from bisect import bisect_right
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import get_datetime, getdate, now
+
+# item = "" يمثل انتقال على مستوى المؤهلية نفسها
+QUALIFICATION_LEVEL = ""
+HISTORY_FIELDS = ["supplier", "item", "effective_from", "status", "qualification", "valid_from", "valid_to"]
+
+
+class SupplierQualificationHistory(Document):
+	"""Append-only transition row; written only through record_transitions."""
+
+	pass
+
+
+def record_transitions(entries: list[dict]):
+	"""Append history rows with one multi-row insert."""
+	if not entries:
+		return
+	timestamp, user = now(), frappe.session.user
+	values = []
+	for e in entries:
+		row = {**e, "effective_from": e.get("effective_from") or timestamp, "item": e.get("item") or QUALIFICATION_LEVEL}
+		values.append((
+			frappe.generate_hash(length=10), timestamp, timestamp, user, user, 0, 0,
+			*(row.get(field) for field in HISTORY_FIELDS),
+		))
+	frappe.db.bulk_insert(
+		"Supplier Qualification History",
+		fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", *HISTORY_FIELDS],
+		values=values,
+	)
+
+
+def on_qualification_change(doc, method=None):
+	"""doc_events (Supplier Qualification on_update/on_trash): append the transitions made by this save."""
+	timestamp = now()
+	base = {"supplier": doc.supplier, "qualification": doc.name, "effective_from": timestamp}
+
+	# الحذف يُسجَّل على مستوى التأهيل فقط حتى تتوقف استعلامات as-of عن اعتباره فعالاً
+	if method == "on_trash":
+		record_transitions([{**base, "item": QUALIFICATION_LEVEL, "status": "Deleted"}])
+		return
+
+	previous = doc.get_doc_before_save()
+	entries = []
+
+	# التواريخ قد تكون str أو date حسب المصدر
+	changed = previous is None or any(
+		str(previous.get(field) or "") != str(doc.get(field) or "")
+		for field in ("approval_status", "valid_from", "valid_to", "supplier")
+	)
+	if changed:
+		entries.append({
+			**base,
+			"item": QUALIFICATION_LEVEL,
+			"status": doc.approval_status,
+			"valid_from": doc.valid_from,
+			"valid_to": doc.valid_to,
+		})
+
+	before = {r.item: r.item_status for r in (previous.get("sq_items") if previous else None) or [] if r.item}
+	after = {r.item: r.item_status for r in doc.get("sq_items") or [] if r.item}
+	for item, status in after.items():
+		if before.get(item) != status:
+			entries.append({**base, "item": item, "status": status})
+	for item in before.keys() - after.keys():
+		entries.append({**base, "item": item, "status": "Removed"})
+
+	record_transitions(entries)
+
+
+# ----------------------------
+# As-of lookups
+# ----------------------------
+
+def _end_of_day(on_date):
+	return get_datetime(f"{getdate(on_date)} 23:59:59.999999")
+
+
+def get_item_status_as_of(supplier: str, item_code: str, on_date) -> dict:
+	"""Two indexed seeks on (supplier, item, effective_from): qualification row + item row."""
+	at = _end_of_day(on_date)
+
+	def seek(item):
+		rows = frappe.db.sql(
+			"""
+			SELECT status, valid_from, valid_to
+			FROM `tabSupplier Qualification History`
+			WHERE supplier = %s AND item = %s AND effective_from <= %s
+			ORDER BY effective_from DESC
+			LIMIT 1
+			""",
+			(supplier, item, at),
+			as_dict=True,
+		)
+		return rows[0] if rows else None
+
+	return _resolve(seek(QUALIFICATION_LEVEL), seek(item_code), getdate(on_date))
+
+
+def get_item_statuses_as_of(lines) -> list[dict]:
+	"""
+	Batch version for audit reports: `lines` is an iterable of (supplier, item_code, date).
+	One range query loads the relevant history; each line is then resolved with bisect.
+	"""
+	lines = list(lines)
+	suppliers = {s for s, _i, _d in lines if s}
+	items = {i for _s, i, _d in lines if i}
+	if not suppliers:
+		return [_resolve(None, None, None) for _line in lines]
+
+	timelines = {}
+	for row in frappe.db.sql(
+		"""
+		SELECT supplier, item, effective_from, status, valid_from, valid_to
+		FROM `tabSupplier Qualification History`
+		WHERE supplier IN %(suppliers)s AND item IN %(items)s
+		ORDER BY supplier, item, effective_from
+		""",
+		{"suppliers": tuple(suppliers), "items": (QUALIFICATION_LEVEL, *items)},
+		as_dict=True,
+	):
+		keys, rows = timelines.setdefault((row.supplier, row.item or QUALIFICATION_LEVEL), ([], []))
+		keys.append(row.effective_from)
+		rows.append(row)
+
+	def at(supplier, item, moment):
+		keys, rows = timelines.get((supplier, item), ((), ()))
+		pos = bisect_right(keys, moment)
+		return rows[pos - 1] if pos else None
+
+	out = []
+	for supplier, item_code, on_date in lines:
+		moment = _end_of_day(on_date)
+		out.append(_resolve(
+			at(supplier, QUALIFICATION_LEVEL, moment), at(supplier, item_code, moment), getdate(on_date)
+		))
+	return out
+
+
+def _resolve(qualification_row, item_row, on_date) -> dict:
+	"""Same rules as get_supplier_items_status_map, evaluated at `on_date`."""
+	qualification_status = qualification_row.status if qualification_row else None
+	active = bool(
+		qualification_row
+		and qualification_status in ("Approved", "Partially Approved")
+		and (not qualification_row.valid_from or getdate(qualification_row.valid_from) <= on_date)
+		and (not qualification_row.valid_to or getdate(qualification_row.valid_to) >= on_date)
+	)
+	if not active:
+		item_status = "Request Approval"
+	elif qualification_status == "Approved":
+		item_status = "Approved"
+	elif item_row and item_row.status in ("Approved", "Rejected"):
+		item_status = item_row.status
+	else:
+		item_status = "Request Approval"
+	return {"qualification_status": qualification_status, "item_status": item_status}
+
+
+AS_OF_DATE_FIELDS = {
+	"Purchase Order": "transaction_date",
+	"Purchase Receipt": "posting_date",
+	"Purchase Invoice": "posting_date",
+	"Supplier Quotation": "transaction_date",
+}
+
+
+@frappe.whitelist()
+def get_purchase_document_statuses_as_of(doctype: str, name: str) -> list[dict]:
+	"""Per-line item status as it was on the document's posting/transaction date."""
+	if doctype not in AS_OF_DATE_FIELDS:
+		frappe.throw(frappe._("As-of qualification lookup is not supported for {0}").format(doctype))
+	doc = frappe.get_doc(doctype, name)
+	doc.check_permission("read")
+
+	on_date = doc.get(AS_OF_DATE_FIELDS[doctype])
+	lines = [(doc.supplier, row.item_code, on_date) for row in doc.items]
+	return [
+		{"idx": row.idx, "item_code": row.item_code, **result}
+		for row, result in zip(doc.items, get_item_statuses_as_of(lines))
+	]
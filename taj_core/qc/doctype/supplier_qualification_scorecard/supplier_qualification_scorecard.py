@@ -0,0 +1,153 @@
+# Copyright (c) 2026, Maged Bajandooh and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import now, today
+
+SCORECARD_BATCH_SIZE = 1000
+SCORECARD_FIELDS = [
+	"qualification",
+	"approval_status",
+	"approved_items",
+	"pending_items",
+	"rejected_items",
+	"next_certificate_expiry",
+	"last_audit_date",
+	"last_evaluation_date",
+]
+
+
+class SupplierQualificationScorecard(Document):
+	"""Read-only summary row per supplier; written only by refresh_scorecards."""
+
+	pass
+
+
+def refresh_scorecards(suppliers) -> int:
+	"""
+	Recompute the scorecard rows of the given suppliers with set-based queries
+	and upsert them in one statement. Returns the number of rows written.
+	"""
+	suppliers = list({s for s in suppliers or [] if s})
+	if not suppliers:
+		return 0
+	if len(suppliers) > SCORECARD_BATCH_SIZE:
+		return sum(
+			refresh_scorecards(suppliers[start : start + SCORECARD_BATCH_SIZE])
+			for start in range(0, len(suppliers), SCORECARD_BATCH_SIZE)
+		)
+
+	# آخر مؤهلية لكل مورد
+	rows = {}
+	for q in frappe.get_all(
+		"Supplier Qualification",
+		filters={"supplier": ["in", suppliers]},
+		fields=["name", "supplier", "approval_status"],
+		order_by="creation DESC",
+	):
+		rows.setdefault(q.supplier, {
+			"qualification": q.name,
+			"approval_status": q.approval_status,
+			"approved_items": 0,
+			"pending_items": 0,
+			"rejected_items": 0,
+			"next_certificate_expiry": None,
+			"last_audit_date": None,
+			"last_evaluation_date": None,
+		})
+
+	# الموردون بدون مؤهلية لا يظهرون في الـ scorecard
+	stale = [s for s in suppliers if s not in rows]
+	if stale:
+		frappe.db.delete("Supplier Qualification Scorecard", {"name": ["in", stale]})
+	if not rows:
+		return 0
+
+	by_qualification = {row["qualification"]: row for row in rows.values()}
+	params = {"parents": tuple(by_qualification), "today": today()}
+
+	for parent, status, count in frappe.db.sql(
+		"""
+		SELECT parent, item_status, COUNT(*)
+		FROM `tabSupplier Approved Item`
+		WHERE parent IN %(parents)s AND parenttype = 'Supplier Qualification'
+		GROUP BY parent, item_status
+		""",
+		params,
+	):
+		key = {"Approved": "approved_items", "Rejected": "rejected_items"}.get(status, "pending_items")
+		by_qualification[parent][key] += count
+
+	aggregates = (
+		("next_certificate_expiry", """
+			SELECT parent, MIN(expiry_date) FROM `tabSupplier Certificate`
+			WHERE parent IN %(parents)s AND parenttype = 'Supplier Qualification'
+			  AND expiry_date >= %(today)s AND certificate_status <> 'Expired'
+			GROUP BY parent
+		"""),
+		("last_audit_date", """
+			SELECT parent, MAX(audit_date) FROM `tabSupplier Audit`
+			WHERE parent IN %(parents)s AND parenttype = 'Supplier Qualification'
+			GROUP BY parent
+		"""),
+		("last_evaluation_date", """
+			SELECT parent, MAX(evaluation_date) FROM `tabSupplier Evaluation`
+			WHERE parent IN %(parents)s AND parenttype = 'Supplier Qualification'
+			GROUP BY parent
+		"""),
+	)
+	for field, sql in aggregates:
+		for parent, value in frappe.db.sql(sql, params):
+			by_qualification[parent][field] = value
+
+	_upsert(rows)
+	return len(rows)
+
+
+def _upsert(rows: dict):
+	timestamp, user = now(), frappe.session.user
+	columns = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "idx", "supplier", *SCORECARD_FIELDS]
+	values, params = [], []
+	for supplier, row in rows.items():
+		values.append("(" + ", ".join(["%s"] * len(columns)) + ")")
+		params.extend([supplier, timestamp, timestamp, user, user, 0, 0, supplier])
+		params.extend(row[field] for field in SCORECARD_FIELDS)
+
+	updates = ", ".join(f"`{c}` = VALUES(`{c}`)" for c in ["modified", "modified_by", *SCORECARD_FIELDS])
+	frappe.db.sql(
+		f"""
+		INSERT INTO `tabSupplier Qualification Scorecard` ({", ".join(f"`{c}`" for c in columns)})
+		VALUES {", ".join(values)}
+		ON DUPLICATE KEY UPDATE {updates}
+		""",
+		params,
+	)
+
+
+def on_qualification_change(doc, method=None):
+	"""doc_events (Supplier Qualification): keep the supplier's scorecard row in sync."""
+	if method == "on_trash":
+		frappe.db.delete("Supplier Qualification Scorecard", {"qualification": doc.name})
+		return
+	previous = doc.get_doc_before_save()
+	suppliers = [doc.supplier]
+	if previous and previous.get("supplier") != doc.supplier:
+		suppliers.append(previous.get("supplier"))
+	refresh_scorecards(suppliers)
+
+
+@frappe.whitelist()
+def rebuild_all_scorecards(batch_size: int = 500) -> int:
+	"""Backfill / repair: recompute every supplier that has a qualification."""
+	frappe.only_for(("System Manager", "Quality Manager"))
+	return _rebuild_all_scorecards(batch_size)
+
+
+def _rebuild_all_scorecards(batch_size: int = 500) -> int:
+	suppliers = frappe.get_all("Supplier Qualification", pluck="supplier", distinct=True)
+	total = 0
+	for start in range(0, len(suppliers), int(batch_size)):
+		total += refresh_scorecards(suppliers[start : start + int(batch_size)])
+		frappe.db.commit()
+	return total
@@ -2,9 +2,13 @@
 import click
 import frappe
 from frappe import _
+from frappe.utils import cint
 from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 
 
+class MissingIndexError(frappe.ValidationError):
+    """A representative query does a full scan of a large table; must fail bench migrate."""
+
 
 def after_install():
     """للتثبيت الأولي"""
@@ -16,6 +20,9 @@ def after_migrate():
     """للتأكد من وجود الحقول بعد كل تحديث"""
     create_all_custom_fields()
     click.secho("✅ Taj Core custom fields verified after migration", fg="green")
+    create_all_indexes()
+    verify_index_usage()
+    click.secho("✅ Taj Core indexes verified after migration", fg="green")
 
 
 def before_uninstall():
@@ -105,6 +112,19 @@ def get_core_fields():
                 "insert_after": "disabled",
             },
         ],
+        "Purchase Order": [
+            {
+                "fieldname": "taj_item_status_digest",
+                "fieldtype": "Data",
+                "label": _("Item Status Digest"),
+                "description": _("Skips item status recomputation on save when supplier, items and qualification are unchanged."),
+                "hidden": 1,
+                "read_only": 1,
+                "no_copy": 1,
+                "print_hide": 1,
+                "insert_after": "supplier",
+            },
+        ],
         "Production Plan": [
             {
                 "fieldname": "taj_consolidate",
@@ -180,4 +200,148 @@ def delete_custom_fields(custom_fields: dict, keep: dict | None = None):
         if existing_fields:
             frappe.db.delete("Custom Field", {"name": ("in", existing_fields)})
             frappe.clear_cache(doctype=doctype)
-            click.secho(f"🗑️ Deleted {len(existing_fields)} fields from {doctype}", fg="yellow")
\ No newline at end of file
+            click.secho(f"🗑️ Deleted {len(existing_fields)} fields from {doctype}", fg="yellow")
+
+# ---------- Composite Indexes ----------
+
+def get_indexes() -> dict:
+    """{doctype: [(index_name, [columns])]} - مسارات البحث في مسار الـ submit"""
+    return {
+        "Supplier Approved Item": [
+            ("taj_parent_item_status", ["parent", "parenttype", "item", "item_status"]),
+        ],
+        "Supplier Qualification History": [
+            # as-of: supplier + item + effective_from في seek واحد
+            ("taj_supplier_item_effective", ["supplier", "item", "effective_from"]),
+        ],
+        # تقرير Employee First/Last Checkins (HRMS) - تُتخطى إن لم تكن الجداول موجودة
+        "Employee Checkin": [
+            ("taj_employee_time", ["employee", "time"]),
+            # MIN/MAX(`time`) لنطاق السنوات في فلتر التقرير
+            ("taj_time", ["time"]),
+        ],
+        "Attendance": [
+            ("taj_employee_attendance_date", ["employee", "attendance_date"]),
+        ],
+        "Holiday": [
+            ("taj_parent_holiday_date", ["parent", "holiday_date"]),
+        ],
+        "Employee Day Summary": [
+            ("taj_employee_log_date", ["employee", "log_date"]),
+        ],
+        "Supplier Certificate": [
+            # نافذة الانتهاء في update_certificate_statuses
+            ("taj_expiry_status", ["expiry_date", "certificate_status"]),
+        ],
+    }
+
+
+# فهارس أُضيفت سابقاً ولا فائدة منها: supplier في Supplier Qualification فريد (field:supplier)
+OBSOLETE_INDEXES = {
+    "Supplier Qualification": ["taj_supplier_status_validity", "taj_supplier_creation"],
+}
+
+
+def create_all_indexes():
+    """ينشئ الفهارس المركبة إن لم تكن موجودة (add_index يتحقق من الوجود)"""
+    for doctype, indexes in get_indexes().items():
+        if not frappe.db.table_exists(doctype):
+            continue
+        for index_name, columns in indexes:
+            frappe.db.add_index(doctype, columns, index_name=index_name)
+
+    for doctype, index_names in OBSOLETE_INDEXES.items():
+        if not frappe.db.table_exists(doctype):
+            continue
+        for index_name in index_names:
+            if frappe.db.has_index(f"tab{doctype}", index_name):
+                frappe.db.sql_ddl(f"ALTER TABLE `tab{doctype}` DROP INDEX `{index_name}`")
+
+
+# قيمتان على الأقل: IN بقيمة واحدة على مفتاح فريد/ثابت يُطوى إلى Impossible WHERE
+PROBE_VALUES = ("_probe_a", "_probe_b")
+FULL_SCAN_ROW_THRESHOLD = 10000
+
+
+def get_index_probes() -> list[tuple[str, str, str, str, dict]]:
+    """(label, table, expected index, sql, params) - نسخ تمثيلية من استعلامات مسار الـ submit"""
+    return [
+        (
+            "approved_item_status",
+            "tabSupplier Approved Item",
+            "taj_parent_item_status",
+            """
+            SELECT item, item_status FROM `tabSupplier Approved Item`
+            WHERE parent IN %(parents)s AND parenttype = 'Supplier Qualification'
+              AND item IN %(items)s AND item_status = 'Approved'
+            """,
+            {"parents": PROBE_VALUES, "items": PROBE_VALUES},
+        ),
+        (
+            "certificate_expiry_window",
+            "tabSupplier Certificate",
+            "taj_expiry_status",
+            """
+            SELECT name FROM `tabSupplier Certificate`
+            WHERE expiry_date >= %(from)s AND expiry_date < %(today)s
+              AND certificate_status <> 'Expired'
+            """,
+            {"from": frappe.utils.add_days(frappe.utils.today(), -1), "today": frappe.utils.today()},
+        ),
+        (
+            "employee_checkins_range",
+            "tabEmployee Checkin",
+            "taj_employee_time",
+            """
+            SELECT employee, `time`, log_type FROM `tabEmployee Checkin`
+            WHERE employee IN %(employees)s AND `time` >= %(from)s AND `time` < %(to)s
+            """,
+            {"employees": PROBE_VALUES, "from": frappe.utils.add_days(frappe.utils.today(), -31), "to": frappe.utils.today()},
+        ),
+        (
+            "employee_day_summary_range",
+            "tabEmployee Day Summary",
+            "taj_employee_log_date",
+            """
+            SELECT employee, log_date, punch_count FROM `tabEmployee Day Summary`
+            WHERE employee IN %(employees)s AND log_date >= %(from)s AND log_date <= %(to)s
+            """,
+            {"employees": PROBE_VALUES, "from": frappe.utils.add_days(frappe.utils.today(), -31), "to": frappe.utils.today()},
+        ),
+    ]
+
+
+def verify_index_usage():
+    """
+    EXPLAIN كل استعلام ممثل. يفشل الـ migrate فقط عند Full Scan على جدول كبير؛
+    غير ذلك (فهرس آخر، أو مسح جدول صغير يفضله المُحسّن) يُسجَّل كتحذير.
+    """
+    failures, warnings = [], []
+    for label, table, index_name, sql, params in get_index_probes():
+        if not frappe.db.table_exists(table[3:]):
+            continue
+        for row in frappe.db.sql(f"EXPLAIN {sql}", params, as_dict=True):
+            if row.get("table") != table:
+                continue
+            possible = (row.get("possible_keys") or "").split(",")
+            chosen = row.get("key")
+            if (row.get("type") or "").upper() == "ALL" and cint(row.get("rows")) > FULL_SCAN_ROW_THRESHOLD:
+                failures.append(f"{label} (~{cint(row.get('rows'))} rows scanned, expected {index_name})")
+            elif index_name not in possible:
+                warnings.append(f"{label} ({index_name} not usable)")
+            elif chosen != index_name:
+                warnings.append(f"{label} (expected {index_name}, used {chosen or 'full scan'})")
+
+    if warnings:
+        message = "Taj Core index check: " + ", ".join(warnings)
+        frappe.logger().warning(message)
+        click.secho(f"⚠️ {message}", fg="yellow")
+
+    if failures:
+        frappe.throw(
+            _("Full table scan detected for: {0}. Run bench migrate to install Taj Core indexes.").format(
+                ", ".join(failures)
+            ),
+            exc=MissingIndexError,
+            title=_("Missing Index"),
+        )
@@ -0,0 +1,61 @@
+# دليل المستخدمين حسب الدور (مشترك بين التكليفات والتنبيهات)
+from __future__ import annotations
+
+import frappe
+
+ROLE_DIRECTORY_CACHE_KEY = "taj_role_directory"
+ROLE_ROUND_ROBIN_KEY = "taj_role_round_robin"
+
+
+def get_role_users(role: str | None) -> list[dict]:
+    """Enabled users holding a role as [{"user", "email"}], sorted by user, cached in Redis."""
+    if not role:
+        return []
+    return frappe.cache().hget(ROLE_DIRECTORY_CACHE_KEY, role, generator=lambda: _load_role_users(role))
+
+
+def get_role_emails(role: str | None) -> list[str]:
+    return [row["email"] for row in get_role_users(role) if row.get("email")]
+
+
+def get_next_assignee(role: str | None) -> str | None:
+    """Round-robin over the enabled users of a role (shared counter across workers)."""
+    assignees = get_next_assignees(role, 1)
+    return assignees[0] if assignees else None
+
+
+def get_next_assignees(role: str | None, count: int) -> list[str]:
+    """Reserve `count` consecutive round-robin turns at once (bulk assignment)."""
+    users = get_role_users(role)
+    if not users or count < 1:
+        return []
+    cache = frappe.cache()
+    last_turn = cache.hincrby(cache.make_key(ROLE_ROUND_ROBIN_KEY), role, count)
+    first_turn = last_turn - count
+    return [users[turn % len(users)]["user"] for turn in range(first_turn, last_turn)]
+
+
+def _load_role_users(role: str) -> list[dict]:
+    return frappe.db.sql(
+        """
+        SELECT DISTINCT u.name AS user, u.email
+        FROM `tabHas Role` hr
+        INNER JOIN `tabUser` u ON u.name = hr.parent
+        WHERE hr.role = %s AND hr.parenttype = 'User' AND u.enabled = 1
+        ORDER BY u.name
+        """,
+        role,
+        as_dict=True,
+    )
+
+
+def clear_role_directory(doc=None, method=None):
+    """
+    doc_events: User تغيّر (أدواره جدول فرعي Has Role يُحفظ معه) - امسح الدليل بالكامل
+    (قد يمس عدة أدوار)، الآن وبعد الـ commit حتى لا يُخزَّن دليل مبني على بيانات ما قبله
+    """
+    def clear():
+        frappe.cache().delete_value(ROLE_DIRECTORY_CACHE_KEY)
+
+    clear()
+    frappe.db.after_commit.add(clear)